@@ -0,0 +1,215 @@
+"""Bundled, minified and fingerprinted static files.
+
+`flask assets build` concatenates each bundle, minifies the parts that aren't
+minified already, names the result after a hash of its content and writes
+.gz and .br copies next to it, all under static/build/. Files a stylesheet
+points at with url() are fingerprinted along with it. static/build/
+manifest.json maps each logical name to its built file.
+
+Templates ask for asset_urls('css/app.css') (or asset_url() for a single
+file); without a build, as in development, they get the source files.
+Built files never change, so they are served with far-future immutable
+cache headers, precompressed when the client accepts it.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+        'css/main.responsive.css', 'css/main.quickfix.css',
+    ],
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js', 'js/script.js',
+    ],
+    'js/app.js': [
+        'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js',
+    ],
+}
+# referenced on their own (the jQuery fallback, IE shims, images)
+FILES = [
+    'js/libs/jquery-1.11.1.min.js', 'js/libs/respond-1.4.2.min.js',
+    'img/front-splash.jpg',
+]
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.eot', '.otf', '.json')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # rjsmin is optional; without it the sources are only concatenated
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def fingerprinted(name, data):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+class Builder:
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.build_folder = os.path.join(static_folder, BUILD_DIR)
+        self.manifest = {}
+
+    def read(self, name):
+        with open(os.path.join(self.static_folder, name), 'rb') as f:
+            return f.read()
+
+    def write(self, name, data):
+        # Writes the fingerprinted file (and its compressed copies) and records
+        # it in the manifest. Old builds are left alone: pages rendered from
+        # the previous manifest may still ask for them.
+        built = posixpath.join(BUILD_DIR, fingerprinted(name, data))
+        path = os.path.join(self.static_folder, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        if name.endswith(COMPRESSIBLE):
+            self.compress(path, data)
+        self.manifest[name] = built
+        return built
+
+    def compress(self, path, data):
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        try:
+            import brotli
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        except ImportError:
+            pass
+        for suffix, compressed in variants:
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+    def file(self, name):
+        if name not in self.manifest:
+            self.write(name, self.read(name))
+        return self.manifest[name]
+
+    def rewrite_urls(self, css, source, built):
+        # Points url() references at the fingerprinted copies, relative to
+        # where the bundle ends up. Missing files are left as they were.
+        def replace(match):
+            quote, url = match.groups()
+            if url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+                return match.group(0)
+            path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+            name = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+            if not os.path.isfile(os.path.join(self.static_folder, name)):
+                return match.group(0)
+            target = posixpath.relpath(self.file(name), posixpath.dirname(built))
+            return f'url({quote}{target}{suffix}{quote})'
+        return CSS_URL.sub(replace, css)
+
+    def bundle(self, name, sources):
+        parts = []
+        for source in sources:
+            text = self.read(source).decode('utf-8')
+            if name.endswith('.css'):
+                text = self.rewrite_urls(text, source, posixpath.join(BUILD_DIR, name))
+                if '.min.' not in source:
+                    text = minify_css(text)
+            elif '.min.' not in source:
+                text = minify_js(text)
+            parts.append(text)
+        # the semicolon keeps one script's last statement from running into
+        # the next one's first
+        separator = '\n' if name.endswith('.css') else ';\n'
+        return self.write(name, separator.join(parts).encode('utf-8'))
+
+    def build(self):
+        for name in FILES:
+            self.file(name)
+        for name, sources in BUNDLES.items():
+            self.bundle(name, sources)
+        with open(os.path.join(self.build_folder, MANIFEST), 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        return self.manifest
+
+
+def build(static_folder):
+    """Builds every bundle and file; returns the manifest."""
+    return Builder(static_folder).build()
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def asset_urls(name):
+    """URLs to load a bundle or file with: the built one, else its sources."""
+    manifest = current_app.extensions['assets']
+    if name in manifest:
+        return [url_for('static', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES.get(name, [name])]
+
+
+def asset_url(name):
+    return asset_urls(name)[0]
+
+
+def send_static(filename):
+    if not filename.startswith(BUILD_DIR + '/'):
+        return current_app.send_static_file(filename)
+
+    static_folder = current_app.static_folder
+    path = safe_join(static_folder, filename)
+    if path is None:
+        raise NotFound()
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_from_directory(
+                static_folder, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0],
+                download_name=posixpath.basename(filename))
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.jinja_env.globals.update(asset_urls=asset_urls, asset_url=asset_url)
+    app.view_functions['static'] = send_static
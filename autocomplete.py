@@ -0,0 +1,199 @@
+"""In-process prefix index of venue and artist names for typeahead.
+
+Each kind keeps a sorted list of (key, id) pairs: one key for the whole
+normalized name and one per later word, so "note" finds "Blue Note Hall".
+A second sorted list holds the whole-name keys alone, so names that start
+with the prefix come first even when many others only have a word that does.
+A lookup is a bisect to the first key at or after the prefix and a short
+scan of each list; nothing touches the database.
+
+The index is per worker. It is built before a worker's first request,
+patched by the create/edit/delete handlers of the worker that made the
+change, and rebuilt from the database once it is AUTOCOMPLETE_MAX_AGE
+seconds old, which is how the other workers pick the change up. A newer
+mtime on AUTOCOMPLETE_STAMP_FILE (see `flask autocomplete rebuild`) makes
+every worker on the host rebuild on its next lookup; checking it is a
+stat(), not a query.
+"""
+import os
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from flask import current_app
+from models import db, Venue, Artist
+
+KINDS = {'venues': Venue, 'artists': Artist}
+
+
+def normalize(name):
+    # case, accents and punctuation don't matter: "Café  Z'Rock" -> "cafe z rock"
+    name = unicodedata.normalize('NFKD', name or '')
+    name = ''.join(c for c in name if not unicodedata.combining(c)).casefold()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in name).split())
+
+
+def keys(name):
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def scan(entries, prefix, limit, found):
+    # adds the ids of entries whose key starts with prefix to found, in key
+    # order, until it holds limit ids
+    position = bisect_left(entries, (prefix,))
+    while position < len(entries) and len(found) < limit:
+        key, entity_id = entries[position]
+        if not key.startswith(prefix):
+            break
+        found.setdefault(entity_id, None)
+        position += 1
+    return found
+
+
+def delete(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.entries = []  # sorted (key, id), every key of every name
+        self.whole = []    # sorted (key, id), whole names only
+        self.names = {}    # id -> display name
+
+    def add(self, entity_id, name):
+        self.names[entity_id] = name
+        for key in keys(name):
+            insort(self.entries, (key, entity_id))
+        if normalize(name):
+            insort(self.whole, (normalize(name), entity_id))
+
+    def remove(self, entity_id):
+        name = self.names.pop(entity_id, None)
+        if name is None:
+            return
+        for key in keys(name):
+            delete(self.entries, (key, entity_id))
+        delete(self.whole, (normalize(name), entity_id))
+
+    def search(self, prefix, limit=10):
+        """Ids and names starting with prefix (or with a word that does),
+        whole-name matches first, each id once."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        whole = list(scan(self.whole, prefix, limit, {}))
+        words = list(scan(self.entries, prefix, limit, dict.fromkeys(whole)))[len(whole):]
+        words.sort(key=lambda entity_id: self.names[entity_id].casefold())
+        return [{'id': entity_id, 'name': self.names[entity_id]} for entity_id in whole + words]
+
+    def size(self):
+        # what the lists, tuples, strings and ints take, not counting the
+        # small ints and interned strings Python shares anyway
+        size = sys.getsizeof(self.entries) + sys.getsizeof(self.whole) + sys.getsizeof(self.names)
+        for key, entity_id in self.entries + self.whole:
+            size += sys.getsizeof((key, entity_id)) + sys.getsizeof(key)
+        for entity_id, name in self.names.items():
+            size += sys.getsizeof(entity_id) + sys.getsizeof(name)
+        return size
+
+
+class Autocomplete:
+    def __init__(self, max_age=300, stamp_file=None):
+        self.max_age = max_age
+        self.stamp_file = stamp_file
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        self.built_at = None
+        self.built_stamp = None
+        self.build_ms = None
+        self._lock = threading.Lock()
+
+    def stamp(self):
+        try:
+            return os.stat(self.stamp_file).st_mtime_ns if self.stamp_file else None
+        except OSError:
+            return None
+
+    def request_rebuild(self):
+        # touches the stamp file, so every worker rebuilds on its next lookup
+        with open(self.stamp_file, 'a'):
+            pass
+        os.utime(self.stamp_file)
+
+    def build(self):
+        # one query per kind; the new indexes replace the old ones in one go.
+        # The stamp is read first, so a rebuild requested meanwhile isn't lost.
+        stamp = self.stamp()
+        start = time.perf_counter()
+        indexes = {}
+        for kind, model in KINDS.items():
+            index = PrefixIndex()
+            rows = db.session.query(model.id, model.name).all()
+            index.names = {entity_id: name for entity_id, name in rows}
+            index.entries = sorted((key, entity_id) for entity_id, name in rows
+                                   for key in keys(name))
+            index.whole = sorted((normalize(name), entity_id) for entity_id, name in rows
+                                 if normalize(name))
+            indexes[kind] = index
+        with self._lock:
+            self.indexes = indexes
+            self.built_at = time.monotonic()
+            self.built_stamp = stamp
+        self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    def stale(self):
+        return (self.built_at is None or time.monotonic() - self.built_at > self.max_age
+                or self.stamp() != self.built_stamp)
+
+    def search(self, kind, prefix, limit=10):
+        if self.stale():
+            self.build()
+        with self._lock:
+            return self.indexes[kind].search(prefix, limit)
+
+    def add(self, kind, entity_id, name):
+        with self._lock:
+            self.indexes[kind].add(entity_id, name)
+
+    def update(self, kind, entity_id, name):
+        with self._lock:
+            self.indexes[kind].remove(entity_id)
+            self.indexes[kind].add(entity_id, name)
+
+    def remove(self, kind, entity_id):
+        with self._lock:
+            self.indexes[kind].remove(entity_id)
+
+    def stats(self):
+        """Entry counts and approximate memory of each index, in bytes."""
+        with self._lock:
+            stats = {kind: {'names': len(index.names), 'keys': len(index.entries),
+                            'bytes': index.size()}
+                     for kind, index in self.indexes.items()}
+        stats['bytes'] = sum(stats[kind]['bytes'] for kind in KINDS)
+        stats['build_ms'] = self.build_ms
+        stats['age_s'] = None if self.built_at is None else round(time.monotonic() - self.built_at)
+        return stats
+
+
+def autocomplete():
+    return current_app.extensions['autocomplete']
+
+
+def build_before_first_request():
+    # Errors (say, tables not migrated yet) must not fail the request; the
+    # next lookup tries again.
+    try:
+        autocomplete().build()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('building the autocomplete index failed')
+
+
+def init_app(app):
+    app.extensions['autocomplete'] = Autocomplete(app.config['AUTOCOMPLETE_MAX_AGE'],
+                                                  app.config['AUTOCOMPLETE_STAMP_FILE'])
+    app.before_first_request(build_before_first_request)
@@ -0,0 +1,151 @@
+"""Deterministic synthetic venues, artists and shows.
+
+The same (shows, seed) always produces the same rows, so numbers measured on
+two commits are comparable.
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+from forms import state_choices, genre_choices
+from models import (db, Venue, Artist, Show, SHOW_DURATION_MINUTES, refresh_show_counters,
+                    refresh_venue_directory, bulk_insert)
+
+WORDS = ['blue', 'note', 'jazz', 'hall', 'park', 'club', 'room', 'cellar',
+         'garden', 'house', 'lounge', 'stage', 'bar', 'theatre', 'union',
+         'velvet', 'echo', 'river', 'north', 'golden']
+CITIES = ['New York', 'San Francisco', 'Austin', 'Chicago', 'Seattle',
+          'Nashville', 'Portland', 'Denver', 'Atlanta', 'Boston']
+STATES = [state for state, _ in state_choices]
+GENRES = [genre for genre, _ in genre_choices]
+
+# one venue per 20 shows and one artist per 10 shows
+SHOWS_PER_VENUE = 20
+SHOWS_PER_ARTIST = 10
+
+
+def sizes(shows):
+    return max(shows // SHOWS_PER_VENUE, 1), max(shows // SHOWS_PER_ARTIST, 1)
+
+
+def name(rng, i):
+    return ' '.join(rng.sample(WORDS, 2)).title() + f' {i}'
+
+
+def venues(count, seed=0):
+    rng = random.Random(f'venues-{seed}')
+    for i in range(1, count + 1):
+        yield {
+            'id': i, 'name': name(rng, i),
+            'city': rng.choice(CITIES), 'state': rng.choice(STATES),
+            'address': f'{rng.randint(1, 999)} Main St', 'phone': '555-555-5555',
+            'genres': rng.sample(GENRES, 2), 'seeking_talent': rng.random() < 0.5,
+            'upcoming_show_count': 0,
+        }
+
+
+def artists(count, seed=0):
+    rng = random.Random(f'artists-{seed}')
+    for i in range(1, count + 1):
+        yield {
+            'id': i, 'name': name(rng, i),
+            'city': rng.choice(CITIES), 'state': rng.choice(STATES),
+            'phone': '555-555-5555', 'genres': rng.sample(GENRES, 2),
+            'seeking_venue': rng.random() < 0.5, 'upcoming_show_count': 0,
+        }
+
+
+def coprime_step(rng, n):
+    # a multiplier that makes i -> i * step % n a permutation of range(n)
+    step = rng.randrange(1, n) if n > 1 else 1
+    while math.gcd(step, n) != 1:
+        step = rng.randrange(1, n)
+    return step
+
+
+def shows(count, seed=0, now=None, venue_count=None, artist_count=None):
+    # Start times spread over two years around `now`, so about half of them
+    # are upcoming. They fall on a grid of slots as long as a show, and a
+    # venue or artist never gets the same slot twice, since the exclusion
+    # constraints on shows would reject the load: shows go out in blocks of
+    # min(venues, artists), each block on its own slot, and within a block
+    # the venue and artist ids are permutations, so none repeats.
+    rng = random.Random(f'shows-{seed}')
+    now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    default_venues, default_artists = sizes(count)
+    venue_count = venue_count or default_venues
+    artist_count = artist_count or default_artists
+    slot_hours = SHOW_DURATION_MINUTES // 60
+    half = 365 * 24 // slot_hours
+    slots = 2 * half + 1
+    width = min(venue_count, artist_count)
+    if -(-count // width) > slots:
+        raise ValueError(
+            f'{count} shows need more than the {slots} slots a venue or artist has; '
+            f'use more venues and artists')
+    venue_step, artist_step, slot_step = (
+        coprime_step(rng, venue_count), coprime_step(rng, artist_count), coprime_step(rng, slots))
+    venue_offset, artist_offset, slot_offset = (
+        rng.randrange(venue_count), rng.randrange(artist_count), rng.randrange(slots))
+    for i in range(count):
+        slot = ((i // width) * slot_step + slot_offset) % slots - half
+        yield {
+            'id': i + 1,
+            'venue_id': (i * venue_step + venue_offset) % venue_count + 1,
+            'artist_id': (i * artist_step + artist_offset) % artist_count + 1,
+            'start_time': now + timedelta(hours=slot * slot_hours),
+        }
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reset():
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('TRUNCATE shows, venue, artist')
+    else:
+        for model in (Show, Venue, Artist):
+            db.session.execute(model.__table__.delete())
+    db.session.commit()
+
+
+def load(show_count, seed=0, chunk_size=10000, venue_count=None, artist_count=None):
+    """Empties the tables and loads a dataset of show_count shows.
+
+    Rows go in through bulk_insert(), one transaction per chunk; counters and
+    the venue directory are computed once at the end.
+    """
+    reset()
+    default_venues, default_artists = sizes(show_count)
+    venue_count = venue_count or default_venues
+    artist_count = artist_count or default_artists
+    postgres = db.engine.dialect.name == 'postgresql'
+    for model, rows in ((Venue, venues(venue_count, seed)),
+                        (Artist, artists(artist_count, seed)),
+                        (Show, shows(show_count, seed, venue_count=venue_count,
+                                     artist_count=artist_count))):
+        for chunk in chunks(rows, chunk_size):
+            bulk_insert(model, chunk)
+            db.session.commit()
+    if postgres:
+        # explicit ids leave the sequences behind
+        for table in ('venue', 'artist', 'shows'):
+            db.session.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 1) FROM {table}))")
+    refresh_show_counters(Venue, ids=db.session.query(Venue.id))
+    refresh_show_counters(Artist, ids=db.session.query(Artist.id))
+    refresh_venue_directory()
+    db.session.commit()
+    if postgres:
+        db.session.execute('ANALYZE venue; ANALYZE artist; ANALYZE shows; ANALYZE venue_directory')
+        db.session.commit()
+    return {'venues': venue_count, 'artists': artist_count, 'shows': show_count}
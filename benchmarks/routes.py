@@ -0,0 +1,123 @@
+"""Latency, throughput and query counts of every route, as JSON.
+
+Loads a deterministic dataset into a scratch database that has been migrated
+with `flask db upgrade` (its venue, artist and shows tables are replaced),
+then drives each route through the WSGI app. Run from the project root:
+
+    FYYUR_BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench \\
+        python -m benchmarks.routes --shows 100000 --output bench.json
+
+Diff two runs' JSON to compare commits. The venue delete is left out, since
+it can only run once per venue.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from app import create_app
+from models import db
+from query_checks import ROUTE_BUDGETS, route_budgets, capture_statements
+from benchmarks import dataset
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank percentile
+    index = max(int(round(fraction * len(sorted_values))) - 1, 0)
+    return sorted_values[index]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_route(app, client, method, url, data, requests, warm_cache):
+    timings = []
+    statements = []
+    for _ in range(requests):
+        if not warm_cache:
+            app.extensions['page_cache'].clear()
+        with capture_statements(db.engine) as captured:
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+            timings.append(time.perf_counter() - start)
+        statements.append(len(captured))
+    timings.sort()
+    return {
+        'status': response.status_code,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+        'throughput_rps': round(len(timings) / sum(timings), 1),
+        'statements_mean': round(sum(statements) / len(statements), 2),
+        'statements_max': max(statements),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000,
+                        help='dataset size, 1000 to 10000000 shows')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--requests', type=int, default=50, help='requests per route')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='keep the page cache between requests')
+    parser.add_argument('--skip-load', action='store_true',
+                        help='reuse the dataset left by the previous run')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    url = os.getenv('FYYUR_BENCH_DATABASE_URL')
+    if not url:
+        sys.exit('FYYUR_BENCH_DATABASE_URL must point at a scratch database')
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    # dataset.load() refreshes the venue directory itself; no background
+    # refresh should run while routes are timed
+    app.config['VENUE_DIRECTORY_AUTO_REFRESH'] = False
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'dataset': {'shows': args.shows, 'seed': args.seed},
+        'requests_per_route': args.requests,
+        'warm_cache': args.warm_cache,
+        'routes': {},
+    }
+
+    with app.app_context():
+        if not args.skip_load:
+            start = time.perf_counter()
+            report['dataset'].update(dataset.load(args.shows, args.seed))
+            report['dataset']['load_seconds'] = round(time.perf_counter() - start, 1)
+
+        client = app.test_client()
+        client.get('/')  # once-per-worker start-up work
+        routes = [route for route in ROUTE_BUDGETS
+                  if not (route[0] == 'POST' and route[1] == '/venues/{venue_id}')]
+        for method, url, data, _ in route_budgets(routes):
+            report['routes'][f'{method} {url}'] = bench_route(
+                app, client, method, url, data, args.requests, args.warm_cache)
+            db.session.remove()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
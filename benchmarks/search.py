@@ -0,0 +1,70 @@
+"""Compare the indexed venue search with the old ILIKE + per-hit count path.
+
+Needs a scratch Postgres database that has been migrated with
+`flask db upgrade`; its venue, artist and shows tables are emptied and
+refilled. Run from the project root:
+
+    FYYUR_BENCH_DATABASE_URL=postgresql://localhost/fyyur_bench \\
+        python -m benchmarks.search --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from app import create_app
+from models import db, Venue, Show
+from search import search
+from benchmarks import dataset
+
+TERMS = ['jazz', 'blue note', 'cellar', 'austin', 'zz', 'no such venue']
+
+
+def legacy_search(term):
+    # The pre-index implementation, kept here as the baseline.
+    venues = Venue.query.filter(Venue.name.ilike(f'%{term}%'))
+    return [{
+        'id': venue.id,
+        'name': venue.name,
+        'num_upcoming_shows': len(Show.query.filter(Show.venue_id == venue.id).filter(
+            Show.start_time > datetime.now()).all()),
+    } for venue in venues]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        db.session.remove()
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    url = os.getenv('FYYUR_BENCH_DATABASE_URL')
+    if not url:
+        sys.exit('FYYUR_BENCH_DATABASE_URL must point at a scratch database')
+    app = create_app()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['VENUE_DIRECTORY_AUTO_REFRESH'] = False
+
+    with app.app_context():
+        dataset.load(args.rows, venue_count=args.rows,
+                     artist_count=dataset.sizes(args.rows)[1])
+        print(f'{"term":<16}{"ilike ms":>12}{"indexed ms":>12}')
+        for term in TERMS:
+            old = timed(lambda: legacy_search(term), args.repeat)
+            new = timed(lambda: search(Venue, term), args.repeat)
+            print(f'{term:<16}{old * 1000:>12.1f}{new * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
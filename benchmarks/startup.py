@@ -0,0 +1,113 @@
+"""Worker start-up time: importing the app, create_app() and the first request.
+
+Each run happens in a fresh interpreter, as a booting worker would, and the
+report gives the median and worst of each phase as JSON, for three template
+set-ups: "cold" (no bytecode cache, no warm-up), "bytecode" (a filled
+TEMPLATE_CACHE_DIR) and "warm" (the cache plus TEMPLATES_WARM_UP). Run from
+the project root:
+
+    python -m benchmarks.startup --runs 20 --output startup.json
+
+The first request goes to / by default. Before it, each worker builds its
+autocomplete index from the database (two queries), so set
+FYYUR_BENCH_DATABASE_URL to a migrated scratch database; without one the
+first request includes a failed connection attempt instead. The build's own
+time is reported as autocomplete_build_ms (null when it failed).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.routes import git_commit
+
+# Runs in the child interpreter; prints one JSON line of timings in ms.
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+if os.getenv('FYYUR_BENCH_DATABASE_URL'):
+    application.config['SQLALCHEMY_DATABASE_URI'] = os.environ['FYYUR_BENCH_DATABASE_URL']
+created = time.perf_counter()
+response = application.test_client().get(sys.argv[1])
+response.get_data()
+done = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (done - created) * 1000,
+    'total_ms': (done - start) * 1000,
+    'autocomplete_build_ms': application.extensions['autocomplete'].build_ms,
+    'modules': len(sys.modules),
+}))
+'''
+
+PHASES = ['import_ms', 'create_app_ms', 'first_request_ms', 'total_ms']
+
+
+def modes(cache_dir):
+    return {
+        'cold': {'FYYUR_TEMPLATE_CACHE_DIR': '', 'FYYUR_TEMPLATES_WARM_UP': '0'},
+        'bytecode': {'FYYUR_TEMPLATE_CACHE_DIR': cache_dir, 'FYYUR_TEMPLATES_WARM_UP': '0'},
+        'warm': {'FYYUR_TEMPLATE_CACHE_DIR': cache_dir, 'FYYUR_TEMPLATES_WARM_UP': '1'},
+    }
+
+
+def run_probe(url, env):
+    output = subprocess.check_output(
+        [sys.executable, '-W', 'ignore', '-c', PROBE, url], text=True,
+        env=dict(os.environ, **env))
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {'status': samples[-1]['status'], 'modules': samples[-1]['modules'],
+               'autocomplete_build_ms': samples[-1]['autocomplete_build_ms']}
+    for phase in PHASES:
+        timings = sorted(sample[phase] for sample in samples)
+        summary[phase] = {
+            'median': round(timings[len(timings) // 2], 1),
+            'max': round(timings[-1], 1),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--url', default='/', help='route of the first request')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'url': args.url,
+        'runs': args.runs,
+        'modes': {},
+    }
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode, env in modes(cache_dir).items():
+            if mode == 'bytecode':
+                run_probe(args.url, env)  # fills the cache
+            samples = [run_probe(args.url, env) for _ in range(args.runs)]
+            report['modes'][mode] = summarize(samples)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process cache with a size bound, per-entry TTL and hit/miss counters."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"backend": "memory", "hits": self.hits, "misses": self.misses,
+                "size": len(self._entries), "maxsize": self.maxsize}
+
+
+class RedisCache:
+    """Cache shared by every worker, so a page one worker built serves them all.
+
+    Nothing is deleted on writes: the page keys carry the page version (see
+    views.venue_page_key()), so after an edit every worker looks up a new
+    key, and the old entries age out with the TTL. `client` can be anything
+    with redis' get/setex/scan_iter/delete, which lets a local stand-in
+    replace the server.
+    """
+
+    def __init__(self, url=None, ttl=60, prefix='fyyur:', client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+def make_cache(config):
+    if config['PAGE_CACHE_BACKEND'] == 'redis':
+        return RedisCache(config['PAGE_CACHE_URL'], ttl=config['PAGE_CACHE_TTL'])
+    return LRUCache(maxsize=config['PAGE_CACHE_SIZE'], ttl=config['PAGE_CACHE_TTL'])
@@ -0,0 +1,155 @@
+"""Venue and artist calendars: the shows in a date window, as JSON or iCalendar.
+
+A window is read with one range scan of the (venue_id, start_time) or
+(artist_id, start_time) index on shows and streamed out a batch at a time
+like the exports. calendar_version() gives each (entity, window) its own
+ETag, so clients and proxies can cache every window separately.
+"""
+import hashlib
+import json
+from datetime import timedelta, timezone
+from sqlalchemy import and_, func
+from models import db, Venue, Artist, Show, show_key
+
+BATCH_SIZE = 500
+
+FORMATS = {
+    'json': 'application/json',
+    'ics': 'text/calendar',
+}
+
+
+def window_bounds(date_from, date_to):
+    # inclusive dates -> [start, end) datetimes
+    return date_from, date_to + timedelta(days=1)
+
+
+def calendar_version(model, entity_id, date_from, date_to):
+    """(name, etag, last_modified) of an entity's calendar window, None if the
+    entity doesn't exist; one aggregate over the window's shows."""
+    start, end = window_bounds(date_from, date_to)
+    other = Artist if model is Venue else Venue
+    version = db.session.query(
+        model.name,
+        model.updated_at,
+        func.max(Show.updated_at),
+        func.max(other.updated_at),
+        func.count(Show.id),
+    ).outerjoin(
+        Show, and_(show_key(model) == model.id,
+                   Show.start_time >= start, Show.start_time < end)
+    ).outerjoin(
+        other, show_key(other) == other.id
+    ).filter(
+        model.id == entity_id
+    ).group_by(
+        model.id, model.name, model.updated_at
+    ).first()
+    if version is None:
+        return None
+
+    name = version[0]
+    etag = hashlib.sha1(
+        f'{model.__tablename__}:{entity_id}:{date_from}:{date_to}:{version}'.encode()
+    ).hexdigest()
+    last_modified = max(moment for moment in version[1:4] if moment)
+    return name, etag, last_modified.replace(tzinfo=timezone.utc)
+
+
+def calendar_shows(model, entity_id, date_from, date_to):
+    """The window's shows with their artist and venue, by start time."""
+    start, end = window_bounds(date_from, date_to)
+    return db.session.query(
+        Show.id, Show.start_time, Show.duration, Show.updated_at,
+        Show.artist_id, Artist.name.label('artist_name'),
+        Show.venue_id, Venue.name.label('venue_name'),
+        Venue.address, Venue.city, Venue.state,
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    ).filter(
+        show_key(model) == entity_id,
+        Show.start_time >= start,
+        Show.start_time < end,
+    ).order_by(
+        Show.start_time
+    ).yield_per(BATCH_SIZE)
+
+
+def batched(lines):
+    # joins lines into chunks of BATCH_SIZE so the response isn't a write per row
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def json_lines(model, entity_id, name, date_from, date_to, shows):
+    header = json.dumps({
+        f'{model.__tablename__}_id': entity_id, 'name': name,
+        'from': date_from.isoformat(), 'to': date_to.isoformat(),
+    })
+    # the header object stays open for the shows array that follows
+    yield header[:-1] + ', "shows": ['
+    for position, show in enumerate(shows):
+        yield (', ' if position else '') + json.dumps({
+            'id': show.id,
+            'start_time': show.start_time.isoformat(),
+            'end_time': (show.start_time + timedelta(minutes=show.duration)).isoformat(),
+            'artist_id': show.artist_id, 'artist_name': show.artist_name,
+            'venue_id': show.venue_id, 'venue_name': show.venue_name,
+        })
+    yield ']}\n'
+
+
+def ics_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(
+        ',', '\\,').replace('\n', '\\n')
+
+
+def ics_line(line):
+    # content lines end in CRLF and fold at 75 octets (RFC 5545, 3.1)
+    encoded = line.encode()
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:  # inside a UTF-8 sequence
+            cut -= 1
+        parts.append(encoded[:cut])
+        encoded = encoded[cut:]
+    parts.append(encoded)
+    return '\r\n '.join(part.decode() for part in parts) + '\r\n'
+
+
+def ics_lines(model, entity_id, name, date_from, date_to, shows):
+    # start times are local wall-clock times, so they go out as floating times
+    yield ics_line('BEGIN:VCALENDAR')
+    yield ics_line('VERSION:2.0')
+    yield ics_line('PRODID:-//Fyyur//Calendar//EN')
+    yield ics_line(f'X-WR-CALNAME:{ics_text(name)}')
+    for show in shows:
+        end_time = show.start_time + timedelta(minutes=show.duration)
+        location = ', '.join(part for part in (show.venue_name, show.address, show.city, show.state)
+                             if part)
+        for line in (
+            'BEGIN:VEVENT',
+            f'UID:show-{show.id}@fyyur',
+            f'DTSTAMP:{show.updated_at:%Y%m%dT%H%M%S}Z',
+            f'DTSTART:{show.start_time:%Y%m%dT%H%M%S}',
+            f'DTEND:{end_time:%Y%m%dT%H%M%S}',
+            f'SUMMARY:{ics_text(f"{show.artist_name} at {show.venue_name}")}',
+            f'LOCATION:{ics_text(location)}',
+            'END:VEVENT',
+        ):
+            yield ics_line(line)
+    yield ics_line('END:VCALENDAR')
+
+
+def calendar_chunks(format, model, entity_id, name, date_from, date_to):
+    lines = json_lines if format == 'json' else ics_lines
+    shows = calendar_shows(model, entity_id, date_from, date_to)
+    return batched(lines(model, entity_id, name, date_from, date_to, shows))
@@ -0,0 +1,204 @@
+"""`flask` commands, added to the app by create_app().
+
+Modules only a command needs (the benchmark dataset, the query checks, the
+importer and exporter) are imported when it runs, so importing app doesn't
+load them.
+"""
+import sys
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+import assets
+import autocomplete
+import templating
+from models import db, Venue, Artist, double_bookings, refresh_show_counters, refresh_venue_directory
+
+# what importer.IMPORTS and exporter.EXPORTS handle
+KINDS = ['artists', 'shows', 'venues']
+
+
+@click.command('refresh-show-counters')
+@with_appcontext
+def refresh_show_counters_command():
+    """Moves shows that have started out of the upcoming counters (run from cron)."""
+    venues = refresh_show_counters(Venue)
+    artists = refresh_show_counters(Artist)
+    db.session.commit()
+    print(f"Refreshed {venues} venues and {artists} artists.")
+
+
+@click.command('refresh-venue-directory')
+@with_appcontext
+def refresh_venue_directory_command():
+    """Rebuilds the /venues directory so upcoming counts age (run from cron)."""
+    refresh_venue_directory()
+    db.session.commit()
+    print("Refreshed the venue directory.")
+
+
+@click.command('report-double-bookings')
+@with_appcontext
+def report_double_bookings_command():
+    """Lists shows that overlap at one venue or for one artist; fails if any do."""
+    pairs = double_bookings()
+    for pair in pairs:
+        print(f"{pair.kind} {pair.entity_id}: show {pair.first_id} ({pair.first_start}) "
+              f"overlaps show {pair.second_id} ({pair.second_start})")
+    if pairs:
+        sys.exit(f"{len(pairs)} double booking(s).")
+    print("No double bookings.")
+
+
+@click.command('check-indexes')
+@click.option('--database-url', envvar='FYYUR_BENCH_DATABASE_URL', required=True,
+              help='Scratch database; its venue, artist and shows tables are replaced.')
+@click.option('--scale', default=10000, help='Show count of the loaded dataset.')
+@with_appcontext
+def check_indexes_command(database_url, scale):
+    """EXPLAINs every read route and fails if one falls back to a Seq Scan on
+    shows, or doesn't answer with a 2xx."""
+    from benchmarks import dataset
+    from query_checks import find_seq_scans
+    current_app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    current_app.config['VENUE_DIRECTORY_AUTO_REFRESH'] = False
+    dataset.load(scale)
+    problems = find_seq_scans(current_app)
+    for url, statement, plan in problems:
+        print(f"{url}\n{statement or ''}\n{plan}\n")
+    if problems:
+        sys.exit(f"{len(problems)} problem(s): sequential scans of shows or failed routes.")
+    print("All read routes use indexes on shows.")
+
+
+@click.command('check-query-budgets')
+@click.option('--database-url', envvar='FYYUR_BENCH_DATABASE_URL', required=True,
+              help='Scratch database; its venue, artist and shows tables are replaced.')
+@click.option('--scales', default='100,1000,10000', help='Comma separated show counts.')
+@with_appcontext
+def check_query_budgets_command(database_url, scales):
+    """Requests every route at several data sizes and fails on any N+1 regression.
+
+    Besides staying under its budget, /venues and /artists must issue as many
+    statements at the largest size as at the smallest.
+    """
+    from benchmarks import dataset
+    from query_checks import check_fixed_counts, check_route_budgets
+    current_app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    # loads and write routes would otherwise keep a refresh running meanwhile
+    current_app.config['VENUE_DIRECTORY_AUTO_REFRESH'] = False
+    scales = [int(scale) for scale in scales.split(',')]
+    failures = []
+    for scale in scales:
+        dataset.load(scale)
+        for failure in check_route_budgets(current_app):
+            failures.append(f"[{scale} shows] {failure}")
+    failures.extend(check_fixed_counts(current_app, dataset.load, scales))
+    for failure in failures:
+        print(failure, end="\n\n")
+    if failures:
+        sys.exit(f"{len(failures)} request(s) went over their query budget.")
+    print("Every route stayed within its query budget.")
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to csv for *.csv files and ndjson otherwise.')
+@click.option('--chunk-size', default=1000, help='Rows per transaction.')
+@with_appcontext
+def import_command(kind, path, format, chunk_size):
+    """Loads venues, artists or shows from a CSV or NDJSON file."""
+    import importer
+    result = importer.import_file(kind, path, format, chunk_size)
+    for line, message in result.errors:
+        print(f"{path}:{line}: {message}", file=sys.stderr)
+    current_app.extensions['page_cache'].clear()
+    # COPY doesn't go through the session events that schedule this
+    refresh_venue_directory()
+    db.session.commit()
+    print(f"Imported {result.imported} {kind}, {len(result.errors)} row(s) rejected.")
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(KINDS))
+@click.option('--format', default='csv', type=click.Choice(['csv', 'ndjson']))
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+@click.option('--city')
+@click.option('--state')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='Shows only.')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Shows only.')
+@with_appcontext
+def export_command(kind, format, output, city, state, date_from, date_to):
+    """Dumps venues, artists or shows as CSV or NDJSON."""
+    import exporter
+    query = exporter.export_query(
+        kind, city=city, state=state,
+        date_from=date_from and date_from.date(), date_to=date_to and date_to.date())
+    for chunk in exporter.export_lines(kind, format, query):
+        output.write(chunk)
+
+
+@click.group('assets')
+def assets_command():
+    """Static asset pipeline."""
+
+
+@assets_command.command('build')
+@with_appcontext
+def assets_build_command():
+    """Bundles, minifies, fingerprints and precompresses the static files."""
+    manifest = assets.build(current_app.static_folder)
+    for name, built in sorted(manifest.items()):
+        print(f"{name} -> {built}")
+
+
+@click.group('templates')
+def templates_command():
+    """Template bytecode cache."""
+
+
+@templates_command.command('compile')
+@with_appcontext
+def templates_compile_command():
+    """Compiles every template into TEMPLATE_CACHE_DIR (run at build time)."""
+    if not current_app.config['TEMPLATE_CACHE_DIR']:
+        sys.exit("TEMPLATE_CACHE_DIR is not set.")
+    names = templating.load_templates(current_app)
+    print(f"Compiled {len(names)} templates into {current_app.config['TEMPLATE_CACHE_DIR']}.")
+
+
+@click.group('autocomplete')
+def autocomplete_command():
+    """Autocomplete prefix index."""
+
+
+@autocomplete_command.command('rebuild')
+@with_appcontext
+def autocomplete_rebuild_command():
+    """Makes every worker on this host rebuild its index; reports its size.
+
+    The workers keep their own copies in memory; this touches
+    AUTOCOMPLETE_STAMP_FILE, which they check on each lookup.
+    """
+    index = autocomplete.autocomplete()
+    index.request_rebuild()
+    index.build()
+    stats = index.stats()
+    for kind in autocomplete.KINDS:
+        print(f"{kind}: {stats[kind]['names']} names, {stats[kind]['keys']} keys, "
+              f"{stats[kind]['bytes'] / 1024:.0f} KiB")
+    print(f"Built in {stats['build_ms']} ms, {stats['bytes'] / 1024:.0f} KiB in total; "
+          f"workers rebuild on their next lookup.")
+
+
+COMMANDS = [
+    refresh_show_counters_command, refresh_venue_directory_command,
+    report_double_bookings_command, check_indexes_command, check_query_budgets_command,
+    import_command, export_command, assets_command, templates_command, autocomplete_command,
+]
+
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
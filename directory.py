@@ -0,0 +1,101 @@
+"""Keeps the venue directory (models.VenueDirectory) behind /venues fresh.
+
+A commit that touched a venue or a show schedules a refresh in the
+background, VENUE_DIRECTORY_REFRESH_DELAY seconds later; everything
+committed in the meantime rides along with that one refresh, so a burst of
+writes costs one REFRESH, not one each. Upcoming counts also go stale as
+shows start without any write, which `flask refresh-venue-directory` (run
+from cron next to refresh-show-counters) takes care of.
+"""
+import threading
+import time
+from itertools import chain
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Venue, Show, refresh_venue_directory
+
+STALE = 'venue_directory_stale'
+
+
+class DirectoryRefresher:
+    def __init__(self, app, delay=2):
+        self.app = app
+        self.delay = delay
+        self.refreshes = 0
+        self.refresh_ms = None
+        self.refreshed_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        if not self.app.config['VENUE_DIRECTORY_AUTO_REFRESH']:
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self.refresh)
+            # a refresh lost at shutdown is made up by the next one
+            self._timer.daemon = True
+            self._timer.start()
+
+    def refresh(self):
+        with self._lock:
+            self._timer = None
+        with self.app.app_context():
+            start = time.perf_counter()
+            try:
+                refresh_venue_directory()
+                db.session.commit()
+                self.refreshes += 1
+                self.refresh_ms = round((time.perf_counter() - start) * 1000, 1)
+                self.refreshed_at = time.time()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('refreshing the venue directory failed')
+            finally:
+                db.session.remove()
+
+    def stats(self):
+        return {
+            'pending': self._timer is not None,
+            'refreshes': self.refreshes,
+            'refresh_ms': self.refresh_ms,
+            'age_s': None if self.refreshed_at is None else round(time.time() - self.refreshed_at),
+        }
+
+
+def directory():
+    return current_app.extensions['venue_directory']
+
+
+def note_flush(session, flush_context):
+    if any(isinstance(instance, (Venue, Show))
+           for instance in chain(session.new, session.dirty, session.deleted)):
+        session.info[STALE] = True
+
+
+def note_bulk_change(context):
+    # query.update()/delete(), e.g. the show counters on Venue
+    if context.mapper.class_ in (Venue, Show):
+        context.session.info[STALE] = True
+
+
+def after_commit(session):
+    if session.info.pop(STALE, False) and has_app_context():
+        directory().schedule()
+
+
+def after_rollback(session):
+    session.info.pop(STALE, None)
+
+
+def init_app(app):
+    app.extensions['venue_directory'] = DirectoryRefresher(
+        app, app.config['VENUE_DIRECTORY_REFRESH_DELAY'])
+    if not event.contains(Session, 'after_commit', after_commit):
+        event.listen(Session, 'after_flush', note_flush)
+        event.listen(Session, 'after_bulk_update', note_bulk_change)
+        event.listen(Session, 'after_bulk_delete', note_bulk_change)
+        event.listen(Session, 'after_commit', after_commit)
+        event.listen(Session, 'after_rollback', after_rollback)
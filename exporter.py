@@ -0,0 +1,98 @@
+"""Streaming CSV/NDJSON dumps of venues, artists and shows.
+
+Rows are read through a server-side cursor (yield_per) and written out a
+batch at a time, so memory stays flat whatever the table size. The columns
+match what `flask import` reads back.
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from models import db, Venue, Artist, Show
+
+BATCH_SIZE = 1000
+
+VENUE_COLUMNS = [
+    ('id', Venue.id), ('name', Venue.name), ('city', Venue.city),
+    ('state', Venue.state), ('address', Venue.address), ('phone', Venue.phone),
+    ('genres', Venue.genres), ('image_link', Venue.image_link),
+    ('facebook_link', Venue.facebook_link), ('website_link', Venue.website),
+    ('seeking_talent', Venue.seeking_talent),
+    ('seeking_description', Venue.seeking_description),
+]
+ARTIST_COLUMNS = [
+    ('id', Artist.id), ('name', Artist.name), ('city', Artist.city),
+    ('state', Artist.state), ('phone', Artist.phone), ('genres', Artist.genres),
+    ('image_link', Artist.image_link), ('facebook_link', Artist.facebook_link),
+    ('website_link', Artist.website), ('seeking_venue', Artist.seeking_venue),
+    ('seeking_description', Artist.seeking_description),
+]
+SHOW_COLUMNS = [
+    ('id', Show.id), ('artist_id', Show.artist_id), ('artist', Artist.name),
+    ('venue_id', Show.venue_id), ('venue', Venue.name),
+    ('start_time', Show.start_time), ('duration', Show.duration),
+]
+EXPORTS = {
+    'venues': (Venue, VENUE_COLUMNS),
+    'artists': (Artist, ARTIST_COLUMNS),
+    'shows': (Show, SHOW_COLUMNS),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_query(kind, city=None, state=None, date_from=None, date_to=None):
+    """Query of the rows to export, ordered by id.
+
+    city/state filter venues and artists by their own location and shows by
+    their venue's; date_from/date_to (inclusive dates) only apply to shows.
+    """
+    model, columns = EXPORTS[kind]
+    query = db.session.query(*[column.label(name) for name, column in columns])
+    located = model
+    if model is Show:
+        query = query.join(Artist, Show.artist_id == Artist.id).join(
+            Venue, Show.venue_id == Venue.id)
+        located = Venue
+        if date_from:
+            query = query.filter(Show.start_time >= date_from)
+        if date_to:
+            query = query.filter(Show.start_time < date_to + timedelta(days=1))
+    if city:
+        query = query.filter(located.city == city)
+    if state:
+        query = query.filter(located.state == state)
+    return query.order_by(model.id).yield_per(BATCH_SIZE)
+
+
+def export_value(value, format):
+    if isinstance(value, list):
+        return value if format == 'ndjson' else ';'.join(value)
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool) and format == 'csv':
+        return 'y' if value else ''
+    return value
+
+
+def export_lines(kind, format, query):
+    """Yields the export in chunks of about BATCH_SIZE rows."""
+    names = [name for name, _ in EXPORTS[kind][1]]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == 'csv':
+        writer.writerow(names)
+
+    for count, row in enumerate(query, 1):
+        values = [export_value(value, format) for value in row]
+        if format == 'csv':
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(names, values))) + '\n')
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -5,9 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # needs FYYUR_BENCH_DATABASE_URL pointing at a migrated scratch database
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "FLASK_APP=app.py flask check-query-budgets && FLASK_APP=app.py flask check-indexes",
+            capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -1,8 +1,9 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError
-from wtforms.validators import DataRequired, AnyOf, URL, Length,Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, ValidationError
+from wtforms.validators import DataRequired, AnyOf, URL, Length,Regexp, NumberRange, Optional
 import re
+from models import SHOW_DURATION_MINUTES
 
 state_choices = [
     ('AL', 'AL'),
@@ -96,6 +97,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    # minutes; up to a day
+    duration = IntegerField(
+        'duration', validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        default=SHOW_DURATION_MINUTES
+    )
 
 # -------------------------------------------------------------------------
 # ------------------------VENUES FORM-------------------------------------
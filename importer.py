@@ -0,0 +1,235 @@
+"""Bulk import of venues, artists and shows from CSV or NDJSON files.
+
+Rows are validated with the same rules as the web forms, resolved and loaded
+in chunks with bulk_insert(); a bad row is reported and skipped, it never
+aborts the rest of the file.
+
+CSV files have one column per form field; multi-valued fields (genres) are
+separated with ';'. Shows may name their artist and venue instead of giving
+ids, with `artist` and `venue` columns, and may give a `duration` in minutes
+(two hours otherwise); rows that double book a venue or an artist are
+rejected by the database's exclusion constraints and reported like any other
+bad row.
+"""
+import csv
+import json
+from datetime import datetime
+from werkzeug.datastructures import MultiDict
+from wtforms.validators import DataRequired
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show, SHOW_DURATION_MINUTES, bulk_insert, refresh_show_counters
+
+TRUE_VALUES = ('y', 'yes', 'true', '1')
+
+
+def read_rows(path, format=None):
+    """Yields (line number, row dict, error) without loading the whole file;
+    a line that doesn't parse comes with no row and an error message."""
+    format = format or ('csv' if path.endswith('.csv') else 'ndjson')
+    with open(path, newline='') as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield line_no, None, f'not valid JSON: {error}'
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, None, 'not a JSON object'
+                    continue
+                yield line_no, row, None
+
+
+def form_data(row):
+    data = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if isinstance(value, list):
+            values = value
+        elif key == 'genres':
+            values = [genre.strip() for genre in str(value).split(';') if genre.strip()]
+        elif isinstance(value, bool):
+            values = ['y'] if value else []
+        else:
+            values = [str(value)]
+        for item in values:
+            data.add(key, item)
+    return data
+
+
+def validate(form_class, data):
+    """Returns {field: [messages]} for the row, using the form's validators.
+
+    Blank optional fields (the URLs, for instance) are skipped, as they are
+    on the web forms' happy path.
+    """
+    form = form_class(formdata=data, meta={'csrf': False})
+    form.validate()
+    errors = {}
+    for name, messages in form.errors.items():
+        field = getattr(form, name)
+        required = any(isinstance(v, DataRequired) for v in field.validators)
+        if not required and not data.get(name):
+            continue
+        errors[name] = messages
+    return errors
+
+
+def is_true(data, key):
+    return data.get(key, '').lower() in TRUE_VALUES
+
+
+def venue_values(data):
+    return {
+        'name': data['name'], 'genres': data.getlist('genres'),
+        'city': data['city'], 'state': data['state'], 'address': data['address'],
+        'phone': data['phone'], 'image_link': data.get('image_link') or None,
+        'facebook_link': data.get('facebook_link') or None,
+        'website': data.get('website_link') or None,
+        'seeking_talent': is_true(data, 'seeking_talent'),
+        'seeking_description': data.get('seeking_description', ''),
+        'upcoming_show_count': 0,
+    }
+
+
+def artist_values(data):
+    return {
+        'name': data['name'], 'genres': data.getlist('genres'),
+        'city': data['city'], 'state': data['state'], 'phone': data['phone'],
+        'image_link': data.get('image_link') or None,
+        'facebook_link': data.get('facebook_link') or None,
+        'website': data.get('website_link') or None,
+        'seeking_venue': is_true(data, 'seeking_venue'),
+        'seeking_description': data.get('seeking_description', ''),
+        'upcoming_show_count': 0,
+    }
+
+
+def show_values(data):
+    return {
+        'artist_id': int(data['artist_id']),
+        'venue_id': int(data['venue_id']),
+        'start_time': datetime.strptime(data['start_time'], '%Y-%m-%d %H:%M:%S'),
+        'duration': int(data.get('duration') or SHOW_DURATION_MINUTES),
+    }
+
+
+class NameLookup:
+    """Name -> id maps of every artist and venue, loaded with one query each,
+    so resolving a show's references never touches the database."""
+
+    def __init__(self):
+        self.ids = {}
+        self.known = {}
+        for model in (Venue, Artist):
+            self.ids[model] = {name.lower(): id for id, name in
+                               db.session.query(model.id, model.name)}
+            self.known[model] = set(self.ids[model].values())
+
+    def resolve(self, data, key, model):
+        # Fills in <key>_id from a <key> name column when no id was given and
+        # checks the id exists. Returns an error message or None.
+        if not data.get(f'{key}_id') and data.get(key):
+            entity_id = self.ids[model].get(data[key].strip().lower())
+            if entity_id is None:
+                return f'unknown {key} "{data[key]}"'
+            data[f'{key}_id'] = str(entity_id)
+        entity_id = data.get(f'{key}_id')
+        if entity_id and not (entity_id.isdigit() and int(entity_id) in self.known[model]):
+            return f'unknown {key}_id {entity_id}'
+        return None
+
+
+IMPORTS = {
+    'venues': (Venue, VenueForm, venue_values),
+    'artists': (Artist, ArtistForm, artist_values),
+    'shows': (Show, ShowForm, show_values),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def import_file(kind, path, format=None, chunk_size=1000):
+    """Imports a file of venues, artists or shows; returns an ImportResult."""
+    model, form_class, values = IMPORTS[kind]
+    lookup = NameLookup() if kind == 'shows' else None
+    result = ImportResult()
+    chunk = []
+
+    for line, row, error in read_rows(path, format):
+        if error:
+            result.error(line, error)
+            continue
+        data = form_data(row)
+        if lookup:
+            unknown = (lookup.resolve(data, 'artist', Artist)
+                       or lookup.resolve(data, 'venue', Venue))
+            if unknown:
+                result.error(line, unknown)
+                continue
+        errors = validate(form_class, data)
+        if errors:
+            result.error(line, '; '.join(f'{name}: {", ".join(messages)}'
+                                         for name, messages in errors.items()))
+            continue
+        chunk.append((line, values(data)))
+        if len(chunk) == chunk_size:
+            load_chunk(model, chunk, result)
+            chunk = []
+    load_chunk(model, chunk, result)
+    return result
+
+
+def load_chunk(model, chunk, result):
+    # One transaction per chunk. If the database rejects it, the chunk is
+    # loaded again a row at a time, each under a savepoint, so only the rows
+    # at fault (a double booking, say) are reported.
+    if not chunk:
+        return
+    rows = [values for _, values in chunk]
+    try:
+        bulk_insert(model, rows)
+        refresh_counters(model, rows)
+        db.session.commit()
+        result.imported += len(rows)
+        return
+    except Exception:
+        db.session.rollback()
+
+    loaded = []
+    for line, values in chunk:
+        try:
+            with db.session.begin_nested():
+                bulk_insert(model, [values])
+            loaded.append((line, values))
+        except Exception as error:
+            result.error(line, f'not loaded: {str(error).splitlines()[0]}')
+    try:
+        refresh_counters(model, [values for _, values in loaded])
+        db.session.commit()
+        result.imported += len(loaded)
+    except Exception as error:
+        db.session.rollback()
+        message = str(error).splitlines()[0]
+        for line, _ in loaded:
+            result.error(line, f'not loaded, the batch failed: {message}')
+
+
+def refresh_counters(model, rows):
+    if model is Show and rows:
+        refresh_show_counters(Venue, {row['venue_id'] for row in rows})
+        refresh_show_counters(Artist, {row['artist_id'] for row in rows})
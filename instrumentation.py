@@ -0,0 +1,99 @@
+import json
+import time
+from flask import g, has_app_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class TimedTemplate(Template):
+    # Only top-level renders go through render(); extends/includes are part of
+    # the same call, so this is the whole page's render time.
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_app_context() and 'request_timing' in g:
+                g.request_timing['render'] += time.perf_counter() - start
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if not has_app_context() or 'request_timing' not in g:
+        return
+    timing = g.request_timing
+    timing['statements'] += 1
+    timing['db'] += elapsed
+    if elapsed > timing['slowest']:
+        timing['slowest'] = elapsed
+        timing['slowest_statement'] = statement
+
+
+def start_timing():
+    g.request_started = time.perf_counter()
+    g.request_timing = {'statements': 0, 'db': 0.0, 'render': 0.0,
+                        'slowest': 0.0, 'slowest_statement': None}
+
+
+def log_timing(app, request_line, timing, total):
+    app.logger.info(json.dumps({
+        **request_line,
+        'statements': timing['statements'],
+        'db_ms': round(timing['db'] * 1000, 1),
+        'slowest_ms': round(timing['slowest'] * 1000, 1),
+        'slowest_statement': (timing['slowest_statement'] or '')[:app.config['SQL_LOG_STATEMENT_CHARS']],
+        'render_ms': round(timing['render'] * 1000, 1),
+        'total_ms': round(total * 1000, 1),
+    }))
+
+
+def init_app(app):
+    """Reports statement count, DB and render time of every request.
+
+    The numbers go out as a Server-Timing header and as one JSON log line per
+    request. Listening on the Engine class covers every engine the app uses.
+    Streamed responses (/shows?stream=1, the exports, the calendars) run
+    their queries after the headers are sent, so they get no header and are
+    logged once the body is done instead.
+    """
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+
+    # class-level listeners, shared by every app in the process
+    if not event.contains(Engine, 'after_cursor_execute', after_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(start_timing)
+
+    @app.after_request
+    def report_timing(response):
+        if 'request_timing' not in g:
+            return response
+        timing, started = g.request_timing, g.request_started
+        request_line = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+        }
+        if response.is_streamed:
+            # stream_with_context keeps g around while the body is read, so
+            # the same timing dict collects the streamed statements
+            response.call_on_close(lambda: log_timing(
+                app, request_line, timing, time.perf_counter() - started))
+            return response
+        total = time.perf_counter() - started
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={timing["db"] * 1000:.1f};desc="{timing["statements"]} statements"',
+            f'db-slowest;dur={timing["slowest"] * 1000:.1f}',
+            f'render;dur={timing["render"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]))
+        log_timing(app, request_line, timing, total)
+        return response
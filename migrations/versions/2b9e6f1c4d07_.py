@@ -0,0 +1,37 @@
+"""venue_directory materialized view
+
+Revision ID: 2b9e6f1c4d07
+Revises: 7137dd6f3d55
+Create Date: 2026-10-18 14:48:03.215907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9e6f1c4d07'
+down_revision = '7137dd6f3d55'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # same rows as models.venue_directory_select(); start times are local,
+    # hence LOCALTIMESTAMP
+    op.execute(
+        'CREATE MATERIALIZED VIEW venue_directory AS '
+        'SELECT venue.id, venue.city, venue.state, venue.name, venue.genres, '
+        'count(shows.id) FILTER (WHERE shows.start_time > LOCALTIMESTAMP) AS num_upcoming_shows '
+        'FROM venue LEFT OUTER JOIN shows ON shows.venue_id = venue.id '
+        'GROUP BY venue.id'
+    )
+    # REFRESH ... CONCURRENTLY needs a unique index; the second one is the
+    # order /venues lists them in, the third serves ?genre=
+    op.execute('CREATE UNIQUE INDEX ix_venue_directory_id ON venue_directory (id)')
+    op.execute('CREATE INDEX ix_venue_directory_area ON venue_directory (state, city, name)')
+    op.execute('CREATE INDEX ix_venue_directory_genres ON venue_directory USING gin (genres)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW venue_directory')
@@ -0,0 +1,52 @@
+"""composite indexes on shows
+
+Revision ID: 5d2971479543
+Revises: b032c65c0b1c
+Create Date: 2026-10-18 12:03:55.871342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2971479543'
+down_revision = 'b032c65c0b1c'
+branch_labels = None
+depends_on = None
+
+# name -> (key columns, included columns); the includes let the detail pages
+# answer from the index alone
+INDEXES = {
+    'ix_shows_venue_id_start_time': ('venue_id, start_time', 'artist_id'),
+    'ix_shows_artist_id_start_time': ('artist_id, start_time', 'venue_id'),
+    'ix_shows_start_time_id': ('start_time, id', 'venue_id, artist_id'),
+}
+
+
+def drop_invalid_index(name):
+    # A CONCURRENTLY build that failed part way leaves an INVALID index
+    # behind, which IF NOT EXISTS would then keep forever; drop it first.
+    invalid = op.get_bind().execute(sa.text(
+        'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE c.relname = :name AND NOT i.indisvalid'
+    ), name=name).first()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def upgrade():
+    # CONCURRENTLY can't run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for name, (columns, include) in INDEXES.items():
+            drop_invalid_index(name)
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON shows ({columns}) INCLUDE ({include})'
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,45 @@
+"""GIN indexes on venue and artist genres
+
+Revision ID: 7137dd6f3d55
+Revises: c8bfb003b2ae
+Create Date: 2026-10-18 14:02:11.730418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7137dd6f3d55'
+down_revision = 'c8bfb003b2ae'
+branch_labels = None
+depends_on = None
+
+
+def drop_invalid_index(name):
+    # same as in 5d2971479543: IF NOT EXISTS would keep an INVALID index
+    # from an interrupted build
+    invalid = op.get_bind().execute(sa.text(
+        'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE c.relname = :name AND NOT i.indisvalid'
+    ), name=name).first()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def upgrade():
+    # serve `genres @> ARRAY[...]`, see models.has_genre(); CONCURRENTLY
+    # can't run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            drop_invalid_index(f'ix_{table}_genres')
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_genres '
+                f'ON {table} USING gin (genres)'
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in ('venue', 'artist'):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_genres')
@@ -0,0 +1,38 @@
+"""upcoming show counters on venue and artist
+
+Revision ID: b032c65c0b1c
+Revises: f1bc57133b40
+Create Date: 2026-10-18 10:41:07.204118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b032c65c0b1c'
+down_revision = 'f1bc57133b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.create_index(op.f(f'ix_{table}_next_show_at'), table, ['next_show_at'], unique=False)
+        # backfill from the existing shows
+        op.execute(
+            f'UPDATE {table} SET '
+            f'upcoming_show_count = (SELECT count(*) FROM shows '
+            f'WHERE shows.{key} = {table}.id AND shows.start_time > now()), '
+            f'next_show_at = (SELECT min(start_time) FROM shows '
+            f'WHERE shows.{key} = {table}.id AND shows.start_time > now())'
+        )
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(op.f(f'ix_{table}_next_show_at'), table_name=table)
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'upcoming_show_count')
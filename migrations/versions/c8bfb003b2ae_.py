@@ -0,0 +1,29 @@
+"""updated_at on venue, artist and shows
+
+Revision ID: c8bfb003b2ae
+Revises: 5d2971479543
+Create Date: 2026-10-18 13:26:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8bfb003b2ae'
+down_revision = '5d2971479543'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # UTC like the model's default; the server default also covers COPY loads
+    for table in ('venue', 'artist', 'shows'):
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("timezone('utc', now())")))
+
+
+def downgrade():
+    for table in ('venue', 'artist', 'shows'):
+        op.drop_column(table, 'updated_at')
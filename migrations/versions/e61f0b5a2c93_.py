@@ -0,0 +1,28 @@
+"""duration of shows
+
+Revision ID: e61f0b5a2c93
+Revises: 2b9e6f1c4d07
+Create Date: 2026-10-18 15:21:37.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e61f0b5a2c93'
+down_revision = '2b9e6f1c4d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the default two hours (models.SHOW_DURATION_MINUTES)
+    op.add_column('shows', sa.Column('duration', sa.Integer(), nullable=False,
+                                     server_default='120'))
+    op.create_check_constraint('ck_shows_duration_positive', 'shows', 'duration > 0')
+
+
+def downgrade():
+    op.drop_constraint('ck_shows_duration_positive', 'shows', type_='check')
+    op.drop_column('shows', 'duration')
@@ -0,0 +1,39 @@
+"""search indexes on venue and artist
+
+Revision ID: f1bc57133b40
+Revises: c196ed1c677f
+Create Date: 2026-10-18 09:12:40.518220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1bc57133b40'
+down_revision = 'c196ed1c677f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('venue', 'artist'):
+        # trigram indexes let ILIKE '%term%' and similarity() use an index
+        for column in ('name', 'city', 'state'):
+            op.execute(
+                f'CREATE INDEX ix_{table}_{column}_trgm ON {table} '
+                f'USING gin ({column} gin_trgm_ops)'
+            )
+        # must stay identical to search.search_vector() to be picked up
+        op.execute(
+            f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin "
+            f"(to_tsvector('simple', name || ' ' || city || ' ' || state))"
+        )
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        for column in ('name', 'city', 'state'):
+            op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
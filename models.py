@@ -1,14 +1,208 @@
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ARRAY, ForeignKey, UniqueConstraint
+from flask import current_app, g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm, Column, String, Integer, Boolean, DateTime, ARRAY, ForeignKey, UniqueConstraint, and_, case, cast, func, literal, literal_column, or_, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.pool import NullPool, Pool
+from datetime import datetime, timedelta, timezone
+import csv
+import hashlib
+import io
+import os
+import random
+import time
+import weakref
 from flask_migrate import Migrate
 
-db = SQLAlchemy()
+
+class RoutingSession(SignallingSession):
+    # Requests picked for a replica (see choose_replica()) read from it;
+    # flushes always go to the primary.
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is None or self._flushing:
+            return super().get_bind(mapper, clause)
+        return replica
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = RoutingSQLAlchemy()
+
+# connections handed out since the worker started, held right now and held
+# at most at once, across every engine of the process
+pool_stats = {"checkouts": 0, "in_use": 0, "peak_in_use": 0}
+
+
+def engine_options(config, uri=None):
+    uri = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if uri.get_backend_name() != 'postgresql':
+        return {}
+    if config['DB_PGBOUNCER']:
+        # PgBouncer does the pooling
+        return {'poolclass': NullPool, 'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def set_statement_timeout(session, transaction, connection):
+    # Only web requests are cut short; migrations, the cron commands, imports
+    # and background refreshes run on the same engines for as long as they
+    # need. SET LOCAL also works behind PgBouncer's transaction pooling.
+    timeout = current_app.config['DB_STATEMENT_TIMEOUT_MS'] if has_request_context() else 0
+    if timeout and connection.dialect.name == 'postgresql':
+        connection.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats["checkouts"] += 1
+    pool_stats["in_use"] += 1
+    pool_stats["peak_in_use"] = max(pool_stats["peak_in_use"], pool_stats["in_use"])
+
+
+def on_checkin(dbapi_connection, connection_record):
+    pool_stats["in_use"] -= 1
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {"pool": type(pool).__name__, **pool_stats}
+    if hasattr(pool, 'checkedout'):
+        status.update(size=pool.size(), checked_out=pool.checkedout(),
+                      checked_in=pool.checkedin(), overflow=pool.overflow())
+    return status
+
+
+#----------------------------------------------------------------------------#
+# Forking.
+#----------------------------------------------------------------------------#
+
+# Every engine that has connected in this process, and the pools a forked
+# child inherited from its parent. Those pools' connections belong to the
+# parent: the child must neither use nor close them, and keeping a reference
+# stops garbage collection from closing the sockets under the parent.
+engines = weakref.WeakSet()
+inherited_pools = []
+
+
+def on_engine_connect(connection, branch):
+    engines.add(connection.engine)
+
+
+def dispose_after_fork():
+    # What SQLAlchemy 1.4 calls engine.dispose(close=False): the child starts
+    # with empty pools and opens its own connections on first use.
+    for engine in list(engines):
+        inherited_pools.append(engine.pool)
+        engine.pool = engine.pool.recreate()
+    pool_stats.update(checkouts=0, in_use=0, peak_in_use=0)
+
+
+event.listen(Engine, 'engine_connect', on_engine_connect)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_after_fork)
+
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+def replica_read(view):
+    """Marks a view that only reads, so it may be served from a replica."""
+    view.replica_read = True
+    return view
+
+
+def replica_caught_up(engine, lsn):
+    # Only a Postgres standby that has replayed the user's last write counts;
+    # anything else (a primary, another database) keeps them on the primary.
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.connect() as connection:
+        return bool(connection.execute(
+            "SELECT pg_last_wal_replay_lsn() >= CAST(%(lsn)s AS pg_lsn)", lsn=lsn).scalar())
+
+
+def choose_replica():
+    g.db_replica = None
+    replicas = current_app.extensions['replicas']
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, 'replica_read', False):
+        return
+
+    replica = random.choice(replicas)
+    if time.time() < session.get('primary_until', 0):
+        # read-your-writes: stay on the primary until a replica has replayed
+        # the user's last write or the sticky window runs out
+        lsn = session.get('primary_lsn')
+        if not lsn or not replica_caught_up(replica, lsn):
+            return
+    session.pop('primary_until', None)
+    session.pop('primary_lsn', None)
+    g.db_replica = replica
+
+
+def remember_write(response):
+    if g.get('db_wrote'):
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        if db.engine.dialect.name == 'postgresql':
+            session['primary_lsn'] = db.session.execute('SELECT pg_current_wal_lsn()').scalar()
+    return response
+
+
+def mark_write(session, flush_context):
+    if has_app_context():
+        g.db_wrote = True
+
+
+# Built by hand in their migrations (5d2971479543's INCLUDE columns,
+# 7137dd6f3d55's GIN) in ways the models can't declare, so autogenerate would
+# keep proposing to drop or rebuild them.
+MIGRATION_INDEXES = {
+    'ix_shows_venue_id_start_time',
+    'ix_shows_artist_id_start_time',
+    'ix_shows_start_time_id',
+    'ix_venue_genres',
+    'ix_artist_genres',
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # venue_directory is a materialized view on Postgres, which autogenerate
+    # would otherwise try to create as a table
+    if type_ == 'table' and name == VenueDirectory.__tablename__:
+        return False
+    return not (type_ == 'index' and name in MIGRATION_INDEXES)
+
 
 def db_setup(app):
-    app.config.from_object('config')
-    db.app = app
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     db.init_app(app)
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, include_object=include_object)
+    # class-level listeners, shared by every app in the process
+    if not event.contains(Pool, 'checkout', on_checkout):
+        event.listen(Pool, 'checkout', on_checkout)
+        event.listen(Pool, 'checkin', on_checkin)
+
+    app.extensions['replicas'] = [create_engine(uri, **engine_options(app.config, uri))
+                                  for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+    if app.extensions['replicas']:
+        app.before_request(choose_replica)
+        app.after_request(remember_write)
+        if not event.contains(Session, 'after_flush', mark_write):
+            event.listen(Session, 'after_flush', mark_write)
+
+    if not event.contains(Session, 'after_begin', set_statement_timeout):
+        event.listen(Session, 'after_begin', set_statement_timeout)
     return db
 
 #----------------------------------------------------------------------------#
@@ -31,6 +225,11 @@ class Venue(db.Model):
     website = db.Column(db.String(300))
     seeking_talent = db.Column(db.Boolean, nullable=True, default=False)
     seeking_description = db.Column(db.String(500), nullable=True, default="")
+    # denormalized from shows, see record_new_show() / refresh_show_counters()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, nullable=True, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.timezone('utc', func.now()))
     shows = db.relationship('Show', backref='venue', lazy=True,
                             cascade="delete")
     UniqueConstraint(name)
@@ -52,6 +251,11 @@ class Artist(db.Model):
                               default='https://www.facebook.com/theduelingpianos')
     seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
     seeking_description = db.Column(db.String(500), nullable=True, default="")
+    # denormalized from shows, see record_new_show() / refresh_show_counters()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, nullable=True, index=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.timezone('utc', func.now()))
     shows = db.relationship('Show', backref='artist',
                             lazy=True)
     UniqueConstraint(name)
@@ -59,13 +263,305 @@ class Artist(db.Model):
     def __repr__(self):
         return f'<Artists ID:{self.id}, name: {self.name}, city: {self.city}>'
 
+
+# length of a show when none is given
+SHOW_DURATION_MINUTES = 120
+
+
 class Show(db.Model):
     __tablename__ = 'shows'
+    # created CONCURRENTLY (with covering columns) by migration 5d2971479543
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete="CASCADE"), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artist.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    # minutes; a venue or artist can't have two shows whose [start, end)
+    # overlap (exclusion constraints from migration 9a4c2e7f1b36)
+    duration = db.Column(db.Integer, nullable=False, default=SHOW_DURATION_MINUTES,
+                         server_default=str(SHOW_DURATION_MINUTES))
+    # UTC; also bumped by the counter UPDATEs. The server default (the same
+    # as migration c8bfb003b2ae's) covers rows that arrive through COPY, also
+    # in a schema made with create_all().
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=func.timezone('utc', func.now()))
+
+    @property
+    def end_time(self):
+        return self.start_time + timedelta(minutes=self.duration)
 
     def __repr__(self):
         return f'<Shows show_id: {self.id} venue_id: {self.venue_id} artist_id: {self.artist_id} start_time: {self.start_time} >'
+
+
+class VenueDirectory(db.Model):
+    # What /venues lists. A materialized view when the schema comes from the
+    # migrations (2b9e6f1c4d07), a plain table when it comes from
+    # create_all(); only ever written by refresh_venue_directory().
+    __tablename__ = 'venue_directory'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    name = db.Column(db.String(), nullable=False)
+    genres = db.Column(db.ARRAY(db.String), nullable=False)
+    num_upcoming_shows = db.Column(db.Integer, nullable=False)
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+def show_key(model):
+    return Show.venue_id if model is Venue else Show.artist_id
+
+
+def record_new_show(show):
+    # Bumps the counters of the show's venue and artist inside the caller's
+    # transaction; the UPDATEs are relative so concurrent bookings don't race.
+    if show.start_time <= datetime.now():
+        return
+    for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        model.query.filter(model.id == entity_id).update({
+            model.upcoming_show_count: model.upcoming_show_count + 1,
+            model.next_show_at: case(
+                [(or_(model.next_show_at.is_(None), model.next_show_at > show.start_time),
+                  show.start_time)],
+                else_=model.next_show_at),
+        }, synchronize_session=False)
+
+
+def refresh_show_counters(model, ids=None, now=None):
+    """Recomputes upcoming_show_count and next_show_at from the shows table.
+
+    With ids only those rows are refreshed; without, only rows whose next show
+    has started since the last refresh (the periodic sweep).
+    """
+    now = now or datetime.now()
+    upcoming = db.session.query(Show.id).filter(
+        show_key(model) == model.id, Show.start_time > now)
+    query = model.query
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    else:
+        query = query.filter(model.next_show_at <= now)
+    return query.update({
+        model.upcoming_show_count: upcoming.with_entities(func.count(Show.id)).as_scalar(),
+        model.next_show_at: upcoming.with_entities(func.min(Show.start_time)).as_scalar(),
+    }, synchronize_session=False)
+
+
+#----------------------------------------------------------------------------#
+# Double bookings.
+#----------------------------------------------------------------------------#
+
+def show_end(start_time, duration):
+    if db.engine.dialect.name == 'postgresql':
+        # spelled like the exclusion constraints, so their indexes apply
+        return start_time + duration * literal_column("interval '1 minute'")
+    return func.datetime(start_time, '+' + cast(duration, String) + ' minutes')
+
+
+def overlaps(start_a, end_a, start_b, end_b):
+    # half-open, a show may start when the previous one ends
+    if db.engine.dialect.name == 'postgresql':
+        return func.tsrange(start_a, end_a).op('&&')(func.tsrange(start_b, end_b))
+    return and_(start_a < end_b, start_b < end_a)
+
+
+def conflicting_shows(venue_id, artist_id, start_time, duration):
+    """Shows of the venue or of the artist overlapping the given slot, with
+    the venue and artist names, earliest first.
+
+    On Postgres the exclusion constraints' GiST indexes answer it, so the
+    check costs an index probe per side however many shows there are.
+    """
+    end_time = start_time + timedelta(minutes=duration)
+    return db.session.query(
+        Show.id, Show.start_time, Show.duration,
+        Show.venue_id, Venue.name.label('venue_name'),
+        Show.artist_id, Artist.name.label('artist_name'),
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    ).filter(
+        or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+        overlaps(Show.start_time, show_end(Show.start_time, Show.duration),
+                 start_time, end_time),
+    ).order_by(
+        Show.start_time
+    ).all()
+
+
+def double_bookings():
+    """Every pair of existing shows that overlap at the same venue or with
+    the same artist, as (kind, entity id, first show id, its start, second
+    show id, its start) rows.
+
+    Nothing new gets past the constraints; this finds what predates them.
+    """
+    other = aliased(Show)
+    pairs = []
+    for kind, key in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        pairs += db.session.query(
+            literal(kind).label('kind'), getattr(Show, key).label('entity_id'),
+            Show.id.label('first_id'), Show.start_time.label('first_start'),
+            other.id.label('second_id'), other.start_time.label('second_start'),
+        ).join(
+            other, and_(
+                getattr(other, key) == getattr(Show, key),
+                Show.id < other.id,
+                overlaps(Show.start_time, show_end(Show.start_time, Show.duration),
+                         other.start_time, show_end(other.start_time, other.duration)),
+            )
+        ).order_by(
+            getattr(Show, key), Show.start_time
+        ).all()
+    return pairs
+
+
+#----------------------------------------------------------------------------#
+# Page versions.
+#----------------------------------------------------------------------------#
+
+def page_version(model, entity_id, now=None):
+    """(etag, last_modified) of a venue or artist page, None if it doesn't exist.
+
+    One aggregate over the entity's shows: the page changes when the entity,
+    one of its shows or the artist/venue of one of them is updated, when a
+    show is added or removed, or when an upcoming show starts.
+    """
+    now = now or datetime.now()
+    other = Artist if model is Venue else Venue
+    started = Show.start_time <= now
+    version = db.session.query(
+        model.updated_at,
+        func.max(Show.updated_at),
+        func.max(other.updated_at),
+        func.max(case([(started, Show.start_time)])),
+        func.count(Show.id),
+        func.count(case([(started, Show.id)])),
+    ).outerjoin(
+        Show, show_key(model) == model.id
+    ).outerjoin(
+        other, show_key(other) == other.id
+    ).filter(
+        model.id == entity_id
+    ).group_by(
+        model.id, model.updated_at
+    ).first()
+    if version is None:
+        return None
+
+    updated_at, shows_updated_at, others_updated_at, last_started, _, _ = version
+    etag = hashlib.sha1(f'{model.__tablename__}:{entity_id}:{version}'.encode()).hexdigest()
+    # start times are local, updated_at columns UTC
+    changes = [moment.replace(tzinfo=timezone.utc)
+               for moment in (updated_at, shows_updated_at, others_updated_at) if moment]
+    if last_started:
+        changes.append(last_started.astimezone(timezone.utc))
+    return etag, max(changes)
+
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+def has_genre(model, genre):
+    # `genres @> ARRAY[genre]::varchar[]`, which the GIN index on the column
+    # (migration 7137dd6f3d55) answers; `genre = ANY(genres)` can't use it
+    return model.genres.op('@>')(literal([genre], model.genres.type))
+
+
+def genre_counts(model):
+    """[(genre, count)] over every row of model, most common first, in one
+    aggregate query."""
+    genres = db.session.query(func.unnest(model.genres).label('genre')).subquery()
+    count = func.count().label('count')
+    return db.session.query(genres.c.genre, count).group_by(
+        genres.c.genre
+    ).order_by(
+        count.desc(), genres.c.genre
+    ).all()
+
+
+#----------------------------------------------------------------------------#
+# Venue directory.
+#----------------------------------------------------------------------------#
+
+def venue_directory_select(now):
+    # must match the view's definition in migration 2b9e6f1c4d07
+    upcoming = func.count(case([(Show.start_time > now, Show.id)]))
+    return db.session.query(
+        Venue.id, Venue.city, Venue.state, Venue.name, Venue.genres, upcoming
+    ).outerjoin(
+        Show, Show.venue_id == Venue.id
+    ).group_by(
+        Venue.id
+    )
+
+
+def venue_directory_is_view():
+    return db.session.execute(
+        'SELECT 1 FROM pg_matviews WHERE matviewname = :name',
+        {'name': VenueDirectory.__tablename__}
+    ).scalar() is not None
+
+
+def refresh_venue_directory(now=None):
+    """Rebuilds the venue directory in the session's transaction.
+
+    The materialized view is refreshed CONCURRENTLY, so /venues keeps reading
+    the old rows meanwhile; a venue_directory table (a schema made with
+    create_all()) is emptied and refilled instead.
+    """
+    if db.engine.dialect.name == 'postgresql' and venue_directory_is_view():
+        db.session.execute(
+            f'REFRESH MATERIALIZED VIEW CONCURRENTLY {VenueDirectory.__tablename__}')
+        return
+    table = VenueDirectory.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['id', 'city', 'state', 'name', 'genres', 'num_upcoming_shows'],
+        venue_directory_select(now or datetime.now()).statement))
+
+
+#----------------------------------------------------------------------------#
+# Bulk loading.
+#----------------------------------------------------------------------------#
+
+def copy_value(value):
+    if isinstance(value, list):
+        # Postgres array literal, every element quoted
+        items = (item.replace('\\', '\\\\').replace('"', '\\"') for item in value)
+        return '{' + ','.join(f'"{item}"' for item in items) + '}'
+    return value
+
+
+def bulk_insert(model, rows):
+    """Inserts a list of row dicts (all with the same keys) in one round trip.
+
+    Postgres gets COPY ... FROM STDIN, several times faster than INSERT at
+    millions of rows; other databases an executemany INSERT. Runs in the
+    session's transaction, commit is up to the caller.
+    """
+    if not rows:
+        return
+    if db.engine.dialect.name != 'postgresql':
+        db.session.execute(model.__table__.insert(), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f'COPY {model.__tablename__} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)',
+        buffer)
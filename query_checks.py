@@ -0,0 +1,206 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from sqlalchemy import event
+from models import db, Venue, Artist
+
+# Every route as (method, url, form data, statement budget). Budgets are the
+# most statements one request may issue with a cold page cache, whatever the
+# size of the tables; the ids are filled in from whatever rows exist. Routes
+# that change data come last, with the delete at the very end.
+ROUTE_BUDGETS = [
+    ('GET', '/', None, 0),
+    ('GET', '/venues', None, 2),
+    ('GET', '/venues?genre=Jazz', None, 2),
+    ('POST', '/venues/search', {'search_term': 'a'}, 1),
+    ('GET', '/venues/{venue_id}', None, 3),
+    ('GET', '/venues/create', None, 0),
+    ('GET', '/venues/{venue_id}/edit', None, 1),
+    ('GET', '/artists', None, 2),
+    ('GET', '/artists?genre=Jazz', None, 2),
+    ('POST', '/artists/search', {'search_term': 'a'}, 1),
+    ('GET', '/artists/{artist_id}', None, 3),
+    ('GET', '/artists/create', None, 0),
+    ('GET', '/artists/{artist_id}/edit', None, 1),
+    ('GET', '/shows', None, 1),
+    ('GET', '/shows?upcoming=0', None, 1),
+    ('GET', '/shows/create', None, 0),
+    ('GET', '/api/autocomplete?q=a', None, 0),
+    ('GET', '/export/venues.csv', None, 1),
+    ('GET', '/export/shows.csv?from=2000-01-01&to=2000-12-31', None, 1),
+    ('GET', '/health', None, 1),
+    ('GET', '/api/venues/{venue_id}/calendar?from=2000-01-01&to=2000-12-31', None, 2),
+    ('GET', '/api/artists/{artist_id}/calendar.ics', None, 2),
+    ('POST', '/venues/create', {
+        'name': 'Budget Venue', 'city': 'New York', 'state': 'NY',
+        'address': '1 Main St', 'phone': '555-555-5555', 'genres': ['Jazz'],
+    }, 1),
+    ('POST', '/artists/create', {
+        'name': 'Budget Artist', 'city': 'New York', 'state': 'NY',
+        'phone': '555-555-5555', 'genres': ['Jazz'],
+    }, 2),
+    ('POST', '/venues/{venue_id}/edit', {
+        'name': 'Budget Venue', 'city': 'New York', 'state': 'NY',
+        'address': '1 Main St', 'phone': '555-555-5555', 'genres': ['Jazz'],
+    }, 2),
+    ('POST', '/artists/{artist_id}/edit', {
+        'name': 'Budget Artist', 'city': 'New York', 'state': 'NY',
+        'phone': '555-555-5555', 'genres': ['Jazz'],
+    }, 2),
+    ('POST', '/shows/create', {
+        'artist_id': '{artist_id}', 'venue_id': '{venue_id}',
+        'start_time': '2099-01-01 20:00:00',
+    }, 5),
+    ('POST', '/venues/{venue_id}', None, 6),
+]
+
+# Listings whose statement count must not move with the number of rows, not
+# just stay under their budget.
+FIXED_COUNT_ROUTES = ['/venues', '/artists']
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def capture_statements(engine):
+    """Collects (statement, parameters) for everything this thread sends to
+    engine; background work (the venue directory refresh) and the statement
+    timeout every request transaction starts with aren't counted."""
+    statements = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if (threading.get_ident() == thread
+                and not statement.startswith('SET LOCAL statement_timeout')):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def query_budget(limit, label='block', engine=None):
+    """Fails with the offending SQL when the block issues more than limit statements.
+
+        with query_budget(2, 'venue page'):
+            client.get('/venues/1')
+    """
+    with capture_statements(engine or db.engine) as statements:
+        yield statements
+    if len(statements) > limit:
+        raise QueryBudgetExceeded(
+            f'{label} issued {len(statements)} statements, budget is {limit}:\n'
+            + '\n'.join(f'  {statement}' for statement, _ in statements))
+
+
+def within_query_budget(limit):
+    """Decorator form of query_budget for test functions."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with query_budget(limit, fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def route_budgets(routes=ROUTE_BUDGETS):
+    venue = db.session.query(Venue.id).order_by(Venue.id).first()
+    artist = db.session.query(Artist.id).order_by(Artist.id).first()
+    ids = {'venue_id': venue.id if venue else 0, 'artist_id': artist.id if artist else 0}
+    db.session.remove()
+
+    for method, url, data, limit in routes:
+        if data:
+            data = {key: value.format(**ids) if isinstance(value, str) else value
+                    for key, value in data.items()}
+        yield method, url.format(**ids), data, limit
+
+
+def read_routes():
+    return [route for route in ROUTE_BUDGETS
+            if route[0] == 'GET' or route[1].endswith('/search')]
+
+
+def check_route_budgets(app, routes=ROUTE_BUDGETS):
+    """Requests every route once through the test client; returns the
+    QueryBudgetExceeded errors of the routes that went over budget."""
+    client = app.test_client()
+    # once-per-worker start-up work (the autocomplete index) isn't any
+    # route's cost
+    client.get('/')
+    failures = []
+    for method, url, data, limit in route_budgets(routes):
+        app.extensions['page_cache'].clear()
+        try:
+            with query_budget(limit, f'{method} {url}'):
+                # streamed bodies only run their queries as they're read
+                client.open(url, method=method, data=data).get_data()
+        except QueryBudgetExceeded as error:
+            failures.append(error)
+    return failures
+
+
+def check_fixed_counts(app, load, scales, urls=FIXED_COUNT_ROUTES):
+    """Requests every url after load(scale) for each scale; the smallest scale
+    sets each url's budget for the larger ones. Returns the
+    QueryBudgetExceeded errors of the urls that issued more on more data."""
+    client = app.test_client()
+    client.get('/')
+    budgets = {}
+    failures = []
+    for scale in sorted(scales):
+        load(scale)
+        for url in urls:
+            app.extensions['page_cache'].clear()
+            limit = budgets.get(url, float('inf'))
+            try:
+                with query_budget(limit, f'GET {url} with {scale} shows') as statements:
+                    client.get(url).get_data()
+            except QueryBudgetExceeded as error:
+                failures.append(error)
+            else:
+                budgets.setdefault(url, len(statements))
+    return failures
+
+
+def find_seq_scans(app, table='shows'):
+    """Runs every read route and EXPLAINs the SELECTs it issued.
+
+    Sequential scans are disabled for the EXPLAIN, so the planner only falls
+    back to one when no index can serve the query. Returns a list of
+    (url, statement, plan) for each statement that still scans `table`, and
+    (url, None, reason) for each route that didn't answer with a 2xx, whose
+    statements may never have reached the queries worth checking.
+    """
+    client = app.test_client()
+    problems = []
+    for method, url, data, _ in route_budgets(read_routes()):
+        # a cached page would skip the queries worth checking
+        app.extensions['page_cache'].clear()
+        with capture_statements(db.engine) as statements:
+            response = client.open(url, method=method, data=data)
+            response.get_data()
+        if not 200 <= response.status_code < 300:
+            problems.append((url, None, f'{method} answered {response.status_code}'))
+
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('SET enable_seqscan = off')
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                if f'Seq Scan on {table}' in plan:
+                    problems.append((url, statement, plan))
+        finally:
+            connection.rollback()
+            connection.close()
+    return problems
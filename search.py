@@ -0,0 +1,62 @@
+from sqlalchemy import func, or_, literal_column
+from models import db
+
+
+def search_vector(model):
+    # Same expression as the ix_<table>_search_vector indexes.
+    return func.to_tsvector(
+        literal_column("'simple'"),
+        model.name + ' ' + model.city + ' ' + model.state,
+    )
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, term, page=1, per_page=20):
+    """Ranked, paginated search of venues or artists by name, city or state.
+
+    Every hit carries its number of upcoming shows and the total number of
+    hits, so a page of results costs a single statement.
+    """
+    pattern = f'%{escape_like(term)}%'
+    matches = or_(
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\'),
+        model.state.ilike(pattern, escape='\\'),
+    )
+
+    if db.engine.dialect.name == 'postgresql':
+        # pg_trgm answers the ILIKEs from its indexes; full-text matches on
+        # whole words and similarity on the name decide the order.
+        query = func.plainto_tsquery(literal_column("'simple'"), term)
+        matches = or_(matches, search_vector(model).op('@@')(query))
+        rank = func.greatest(
+            func.similarity(model.name, term),
+            func.ts_rank(search_vector(model), query),
+        )
+        order = (rank.desc(), model.name, model.id)
+    else:
+        order = (model.name, model.id)
+
+    rows = db.session.query(
+        model.id, model.name,
+        model.upcoming_show_count.label('num_upcoming_shows'),
+        func.count().over().label('total'),
+    ).filter(
+        matches
+    ).order_by(
+        *order
+    ).limit(per_page).offset((page - 1) * per_page).all()
+
+    return {
+        "count": rows[0].total if rows else 0,
+        "page": page,
+        "pages": -(-rows[0].total // per_page) if rows else 0,
+        "data": [{
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows,
+        } for row in rows],
+    }
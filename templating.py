@@ -0,0 +1,41 @@
+"""Template bytecode cache and warm-up.
+
+Compiled templates are kept on disk (TEMPLATE_CACHE_DIR), so a new worker
+loads bytecode instead of parsing and compiling every template again.
+`flask templates compile` fills the cache at build time, and with
+TEMPLATES_WARM_UP create_app() loads every template into the environment
+before the worker serves anything; under a preloading server the workers
+inherit them already loaded.
+"""
+import os
+from jinja2 import FileSystemBytecodeCache
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    # Keyed on the template name alone rather than its absolute path, so a
+    # cache filled in a build directory still matches where the app runs.
+    # Jinja checks the source checksum and its own version on load, so a
+    # stale entry is recompiled, never used.
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name)
+
+
+def template_names(app):
+    return [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+
+
+def load_templates(app):
+    """Compiles (or loads from the bytecode cache) every template; returns their names."""
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+def init_app(app):
+    cache_dir = app.config['TEMPLATE_CACHE_DIR']
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = TemplateBytecodeCache(cache_dir)
+    if app.config['TEMPLATES_WARM_UP']:
+        load_templates(app)
@@ -0,0 +1,129 @@
+"""Helpers shared by the blueprints: show times, the page cache and
+conditional responses."""
+from functools import lru_cache, wraps
+import babel
+import dateutil.parser
+from flask import current_app, g, make_response, render_template, request, Response, session
+from werkzeug.http import is_resource_modified
+from models import page_version
+
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+    # Parsing the babel pattern and loading the locale dominate formatting
+    # cost, so both are done once per (format, locale).
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    return pattern, babel.Locale.parse(locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    pattern, locale = datetime_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+
+def with_show_times(shows, format='full', locale='en'):
+    # Adds "start_time_formatted" to every show dict as it passes through, so
+    # it works on a streamed page too; shows that share a start time are only
+    # formatted once.
+    pattern, locale = datetime_pattern(format, locale)
+    formatted = {}
+    for show in shows:
+        start_time = show["start_time"]
+        if start_time not in formatted:
+            formatted[start_time] = pattern.apply(start_time, locale)
+        show["start_time_formatted"] = formatted[start_time]
+        yield show
+
+
+def format_show_times(shows, format='full', locale='en'):
+    # with_show_times() over a list, in one pass
+    for _ in with_show_times(shows, format, locale):
+        pass
+    return shows
+
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# The venue and artist pages cache their template context (not the HTML, which
+# carries the visitor's flashed messages) under these keys. The key holds the
+# page version conditional_page() computed, so any change that moves the ETag
+# (an edit, a new show, a show starting) also misses the cache; entries of
+# old versions are never read again and age out.
+
+def venue_page_key(venue_id, version):
+    return f"venue:{venue_id}:{version}"
+
+
+def artist_page_key(artist_id, version):
+    return f"artist:{artist_id}:{version}"
+
+
+def page_cache():
+    return current_app.extensions['page_cache']
+
+
+#----------------------------------------------------------------------------#
+# Conditional responses.
+#----------------------------------------------------------------------------#
+
+def conditional_page(model):
+    """Serves a venue or artist page with a strong ETag and Last-Modified.
+
+    The page version comes from one aggregate query (see page_version()), so a
+    client or proxy that already holds it gets its 304 before the view runs.
+    Pages carrying flashed messages are personal and are left alone. The
+    version is left in g.page_version for the page cache key.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            version = page_version(model, kwargs[f'{model.__tablename__}_id'])
+            if version is None:
+                return not_found_error(404)
+            etag, last_modified = version
+            # the view caches its context under this version
+            g.page_version = etag
+            if '_flashes' in session:
+                return view(**kwargs)
+
+            if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['DETAIL_PAGE_MAX_AGE']
+            response.cache_control.must_revalidate = True
+            return response
+        return wrapper
+    return decorator
+
+
+#----------------------------------------------------------------------------#
+# Error pages.
+#----------------------------------------------------------------------------#
+
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+def server_error(error):
+    return render_template('errors/500.html'), 500
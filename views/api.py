@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from flask import (Blueprint, Response, abort, current_app, jsonify, request,
+                   stream_with_context)
+from werkzeug.http import is_resource_modified
+from autocomplete import autocomplete, KINDS
+import calendars
+from models import Venue, Artist, replica_read
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+
+@bp.route('/autocomplete')
+def autocomplete_names():
+    # /api/autocomplete?q=blue&kind=venues&limit=10; without kind, both kinds
+    prefix = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    kind = request.args.get('kind')
+    if kind and kind not in KINDS:
+        abort(404)
+    return jsonify({name: autocomplete().search(name, prefix, limit)
+                    for name in ([kind] if kind else KINDS)})
+
+
+@bp.route('/venues/<int:entity_id>/calendar', defaults={'format': 'json'})
+@bp.route('/venues/<int:entity_id>/calendar.<format>')
+@replica_read
+def venue_calendar(entity_id, format):
+    return calendar(Venue, entity_id, format)
+
+
+@bp.route('/artists/<int:entity_id>/calendar', defaults={'format': 'json'})
+@bp.route('/artists/<int:entity_id>/calendar.<format>')
+@replica_read
+def artist_calendar(entity_id, format):
+    return calendar(Artist, entity_id, format)
+
+
+def calendar(model, entity_id, format):
+    # ?from=2022-06-01&to=2022-06-30, inclusive dates; from defaults to today
+    # and to to CALENDAR_DEFAULT_DAYS later
+    if format not in calendars.FORMATS:
+        abort(404)
+    date_from = request.args.get('from', type=date.fromisoformat) or date.today()
+    date_to = request.args.get('to', type=date.fromisoformat) or (
+        date_from + timedelta(days=current_app.config['CALENDAR_DEFAULT_DAYS'] - 1))
+    if not date_from <= date_to < date_from + timedelta(days=current_app.config['CALENDAR_MAX_DAYS']):
+        abort(400)
+
+    version = calendars.calendar_version(model, entity_id, date_from, date_to)
+    if version is None:
+        abort(404)
+    name, etag, last_modified = version
+    if not is_resource_modified(request.environ, etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = Response(
+            stream_with_context(calendars.calendar_chunks(
+                format, model, entity_id, name, date_from, date_to)),
+            mimetype=calendars.FORMATS[format],
+        )
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['CALENDAR_MAX_AGE']
+    return response
@@ -0,0 +1,253 @@
+import sys
+from datetime import datetime
+from flask import Blueprint, current_app, flash, g, redirect, render_template, request, url_for
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import load_only
+from forms import ArtistForm
+from models import db, Venue, Artist, Show, genre_counts, has_genre, replica_read
+from search import search
+from autocomplete import autocomplete
+from views import (artist_page_key, conditional_page, format_show_times, not_found_error,
+                   page_cache)
+
+bp = Blueprint('artists', __name__)
+
+
+@bp.route('/artists')
+@replica_read
+def artists():
+    # ?genre= as on /venues: filtered list, facet counts over all artists
+    genre = request.args.get('genre') or None
+    fields = ["id", "name"]
+    query = db.session.query(Artist).options(load_only(*fields))
+    if genre:
+        query = query.filter(has_genre(Artist, genre))
+    artists_data = query.all()
+    genres = genre_counts(Artist)
+
+    return render_template("pages/artists.html", artists=artists_data, genres=genres, genre=genre)
+
+
+@bp.route('/artists/search', methods=['POST'])
+@replica_read
+def search_artists():
+    # Implements ranked search on artists by name, city or state. Case-insensitive.
+
+    search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    response = search(Artist, search_term, page, current_app.config['SEARCH_PAGE_SIZE'])
+
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@bp.route('/artists/<int:artist_id>')
+@replica_read
+@conditional_page(Artist)
+def show_artist(artist_id):
+    past_limit = max(request.args.get("past_limit", current_app.config["PAST_SHOWS_LIMIT"], type=int), 0)
+    # only the default view is cached
+    cached = past_limit == current_app.config["PAST_SHOWS_LIMIT"]
+
+    data = page_cache().get(artist_page_key(artist_id, g.page_version)) if cached else None
+    if data is not None:
+        return render_template('pages/show_artist.html', artist=data)
+
+    data = {}
+    try:
+        current_time = datetime.now()  # datetime.now().strftime('%Y-%m-%d %H:%S:%M')
+        artist = db.session.query(Artist).get(artist_id)
+
+        if artist is None:
+            return not_found_error(404)
+
+
+        # One joined query: each show is ranked within its past/upcoming
+        # partition (most recent first) and carries both partitions' totals,
+        # so the counts survive the limit on past shows. At least one past
+        # show is kept even with ?past_limit=0, for the totals it carries.
+        is_upcoming = Show.start_time > current_time
+        ranked = db.session.query(
+            Show.venue_id, Show.start_time, Venue.name, Venue.image_link,
+            is_upcoming.label("is_upcoming"),
+            func.count(case([(is_upcoming, 1)])).over().label("upcoming_total"),
+            func.count(case([(~is_upcoming, 1)])).over().label("past_total"),
+            func.row_number().over(
+                partition_by=is_upcoming, order_by=Show.start_time.desc()
+            ).label("position"),
+        ).join(
+            Venue, Show.venue_id == Venue.id
+        ).filter(
+            Show.artist_id == artist_id
+        ).subquery()
+
+        shows = db.session.query(ranked).filter(
+            or_(ranked.c.is_upcoming, ranked.c.position <= max(past_limit, 1))
+        ).order_by(
+            ranked.c.is_upcoming.desc(), ranked.c.start_time
+        ).all()
+
+        upcoming_shows = []
+        past_shows = []
+        upcoming_shows_count = 0
+        past_shows_count = 0
+
+        for show in shows:
+            show_data = {
+                "venue_id": show.venue_id,
+                "venue_name": show.name,
+                "venue_image_link": show.image_link,
+                "start_time": show.start_time
+            }
+            upcoming_shows_count = show.upcoming_total
+            past_shows_count = show.past_total
+            if show.is_upcoming:
+                upcoming_shows.append(show_data)
+            elif len(past_shows) < past_limit:
+                past_shows.append(show_data)
+
+        format_show_times(upcoming_shows + past_shows)
+        data = {"id": artist.id,
+                "name": artist.name,
+                "genres": artist.genres,
+                "city": artist.city,
+                "state": artist.state,
+                "phone": artist.phone,
+                "website": artist.website,
+                "facebook_link": artist.facebook_link,
+                "seeking_venue": artist.seeking_venue,
+                "seeking_description": artist.seeking_description,
+                "image_link": artist.image_link,
+                "past_shows": past_shows,
+                "upcoming_shows": upcoming_shows,
+                "past_shows_count": past_shows_count,
+                "upcoming_shows_count": upcoming_shows_count,
+                }
+        if cached:
+            page_cache().set(artist_page_key(artist_id, g.page_version), data)
+
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Something went wrong. Please try again.")
+        return render_template("pages/home.html")
+
+    finally:
+        db.session.close()
+        return render_template('pages/show_artist.html', artist=data)
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm(request.form)
+
+    try:
+        artist = Artist.query.get(artist_id)
+        if artist is None:
+             return not_found_error(404)
+
+        form.name.data = artist.name
+        form.city.data = artist.city
+        form.state.data = artist.state
+        form.phone.data = artist.phone
+        form.genres.data = artist.genres
+        form.facebook_link.data = artist.facebook_link
+        form.seeking_venue.data = artist.seeking_venue
+        form.seeking_description.data = artist.seeking_description
+        form.image_link.data =  artist.image_link
+
+    except:
+        print(sys.exc_info())
+        flash("Something went wrong. Please try again.")
+        return redirect(url_for("main.index"))
+
+    finally:
+        db.session.close()
+
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  form = ArtistForm(request.form)
+  try:
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        return not_found_error(404)
+
+    artist.name = request.form.get("name")
+    artist.genres = request.form.getlist('genres')
+    artist.city = request.form.get('city')
+    artist.state = request.form.get('state')
+    artist.phone = request.form.get('phone')
+    artist.website = request.form.get('website')
+    artist.facebook_link = request.form.get('facebook_link')
+    artist.image_link = request.form.get('image_link')
+    artist.seeking_venue = (request.form.get("seeking_venue", False) == 'y')
+    artist.seeking_description = request.form.get('seeking_description')
+        
+    db.session.add(artist)
+    db.session.commit()
+    autocomplete().update('artists', artist_id, request.form.get('name'))
+    flash("This artist info was successfully updated!")
+  except:
+    db.session.rollback()
+    print(sys.exc_info())
+    flash(
+            "An error occurred. Artist "
+            + request.form.get("name")
+            + " could not be updated."
+    )
+    return redirect(url_for("main.index"))
+
+  finally:
+    db.session.close()
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    try:
+        new_artist = Artist(
+            name = request.form.get("name"), 
+            city = request.form.get("city"), 
+            state = request.form.get("state"), 
+            phone = request.form.get("phone"), 
+            genres = request.form.getlist("genres"), 
+            website = request.form.get("website"),
+            image_link = request.form.get("website"),
+            facebook_link=request.form.get("facebook_link"),
+            seeking_venue = (request.form.get("seeking_venue") == 'y'),
+            seeking_description = request.form.get("seeking_description"),
+        )
+        db.session.add(new_artist)
+        db.session.commit()
+
+        db.session.refresh(new_artist)
+        autocomplete().add('artists', new_artist.id, new_artist.name)
+        flash("Artist " + request.form.get("name") + " was successfully listed!")
+
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash(
+            "An error occurred. Venue "
+            + request.form.get("name")
+            + " could not be listed."
+        )
+
+    finally:
+        db.session.close()
+        return render_template("pages/home.html")
@@ -0,0 +1,63 @@
+import time
+from datetime import date
+from flask import Blueprint, abort, jsonify, render_template, request, Response, stream_with_context
+from models import db, pool_status, replica_read
+from views import page_cache
+from autocomplete import autocomplete
+from directory import directory
+import exporter
+
+bp = Blueprint('main', __name__)
+
+
+@bp.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<kind>.<format>')
+@replica_read
+def export(kind, format):
+    # streams a full dump, e.g. /export/shows.csv?state=NY&from=2022-01-01&to=2022-12-31
+    if kind not in exporter.EXPORTS or format not in exporter.FORMATS:
+        abort(404)
+
+    query = exporter.export_query(
+        kind,
+        city=request.args.get('city'),
+        state=request.args.get('state'),
+        date_from=request.args.get('from', type=date.fromisoformat),
+        date_to=request.args.get('to', type=date.fromisoformat),
+    )
+    return Response(
+        stream_with_context(exporter.export_lines(kind, format, query)),
+        mimetype=exporter.FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename={kind}.{format}'},
+    )
+
+
+#  Health
+#  ----------------------------------------------------------------
+
+@bp.route('/health')
+def health():
+    # liveness of the database plus this worker's pool and cache numbers
+    status = {"database": "ok"}
+    code = 200
+    try:
+        start = time.perf_counter()
+        db.session.execute('SELECT 1')
+        status["database_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as error:
+        status["database"] = str(error).splitlines()[0]
+        code = 503
+    finally:
+        db.session.close()
+    status["pool"] = pool_status(db.engine)
+    status["page_cache"] = page_cache().stats()
+    status["autocomplete"] = autocomplete().stats()
+    status["venue_directory"] = directory().stats()
+    return jsonify(status), code
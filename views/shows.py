@@ -0,0 +1,176 @@
+import sys
+from datetime import datetime, date, timedelta
+import dateutil.parser
+from flask import Blueprint, current_app, flash, render_template, request, Response, stream_with_context
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from forms import ShowForm
+from models import (db, Venue, Artist, Show, SHOW_DURATION_MINUTES, conflicting_shows,
+                    record_new_show, replica_read)
+from views import with_show_times
+
+bp = Blueprint('shows', __name__)
+
+
+def parse_show_cursor(value):
+    # Cursors look like "<start_time isoformat>_<show id>".
+    start_time, _, show_id = value.rpartition('_')
+    return datetime.fromisoformat(start_time), int(show_id)
+
+
+def parse_flag(value):
+    return value.lower() not in ('0', 'false', 'no', '')
+
+
+def show_rows(query, page_size, pager):
+    # Yields one page of show dicts; the extra row fetched past the page only
+    # tells us where the next page starts.
+    for position, show in enumerate(query.yield_per(100)):
+        cursor = f"{show.start_time.isoformat()}_{show.id}"
+        if position == page_size:
+            pager["next"] = pager["last"]
+            break
+        pager["last"] = cursor
+        yield {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
+        }
+
+
+@bp.route('/shows')
+@replica_read
+def shows():
+    # displays list of shows at /shows, one keyset page at a time
+    # (?after=<cursor>&upcoming=0|1&from=YYYY-MM-DD&to=YYYY-MM-DD&stream=0|1)
+
+    after = request.args.get('after', type=parse_show_cursor)
+    upcoming_only = request.args.get('upcoming', current_app.config['SHOWS_UPCOMING_ONLY'], type=parse_flag)
+    date_from = request.args.get('from', type=date.fromisoformat)
+    date_to = request.args.get('to', type=date.fromisoformat)
+    stream = request.args.get('stream', current_app.config['SHOWS_STREAM'], type=parse_flag)
+    page_size = current_app.config['SHOWS_PAGE_SIZE']
+
+    query = db.session.query(
+        Show.id, Show.start_time, Show.venue_id, Venue.name.label("venue_name"),
+        Show.artist_id, Artist.name.label("artist_name"),
+        Artist.image_link.label("artist_image_link"),
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    )
+    if upcoming_only:
+        query = query.filter(Show.start_time > datetime.now())
+    if date_from:
+        query = query.filter(Show.start_time >= date_from)
+    if date_to:
+        query = query.filter(Show.start_time < date_to + timedelta(days=1))
+    if after:
+        query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    query = query.order_by(Show.start_time, Show.id).limit(page_size + 1)
+
+    filters = {"upcoming": int(upcoming_only)}
+    if date_from:
+        filters["from"] = date_from.isoformat()
+    if date_to:
+        filters["to"] = date_to.isoformat()
+
+    pager = {"last": None, "next": None}
+    rows = with_show_times(show_rows(query, page_size, pager))
+
+    if stream:
+        # Send the page as it renders instead of materialising every tile first.
+        context = {"shows": rows, "pager": pager, "filters": filters}
+        current_app.update_template_context(context)
+        template = current_app.jinja_env.get_template('pages/shows.html')
+        return Response(stream_with_context(template.stream(context)))
+
+    data = []
+    try:
+        data = list(rows)
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Something went wrong, please try again.")
+
+    finally:
+        return render_template('pages/shows.html', shows=data, pager=pager, filters=filters)
+
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    form = ShowForm(request.form)
+    # a duration out of range would only surface as a database error
+    if not form.duration.validate(form):
+        flash("The show was not listed, check its duration.")
+        return render_template('forms/new_show.html', form=form)
+
+    conflicts = []
+    try:
+        artist_id = int(request.form.get("artist_id"))
+        venue_id = int(request.form.get("venue_id"))
+        start_time = dateutil.parser.parse(request.form.get("start_time"))
+        duration = form.duration.data or SHOW_DURATION_MINUTES
+
+        # The exclusion constraints on shows have the final word; checking
+        # first lets the form say which show is in the way.
+        conflicts = conflicting_shows(venue_id, artist_id, start_time, duration)
+        if not conflicts:
+            new_show = Show(
+                artist_id=artist_id, venue_id=venue_id, start_time=start_time,
+                duration=duration
+            )
+
+            db.session.add(new_show)
+            record_new_show(new_show)
+            db.session.commit()
+
+            db.session.refresh(new_show)
+            flash("The show was successfully listed!")
+
+    except IntegrityError:
+        # booked by another request between the check and the insert
+        db.session.rollback()
+        print(sys.exc_info())
+        conflicts = conflicting_shows(venue_id, artist_id, start_time, duration)
+        if not conflicts:
+            flash("An error occurred. The show have not be listed.")
+
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash(
+            "An error occurred. The show have not be listed."
+        )
+
+    finally:
+        db.session.close()
+        if conflicts:
+            form.start_time.errors = [conflict_message(show, venue_id, artist_id)
+                                      for show in conflicts]
+            flash("The show was not listed, it overlaps another booking.")
+            return render_template('forms/new_show.html', form=form)
+        return render_template("pages/home.html")
+
+
+def conflict_message(show, venue_id, artist_id):
+    # e.g. "Blue Note is booked and A1 plays 2099-01-01 20:00-22:00 (show #12: A1 at Blue Note)."
+    booked = []
+    if show.venue_id == venue_id:
+        booked.append(f"{show.venue_name} is booked")
+    if show.artist_id == artist_id:
+        booked.append(f"{show.artist_name} plays")
+    end_time = show.start_time + timedelta(minutes=show.duration)
+    return (f"{' and '.join(booked)} {show.start_time:%Y-%m-%d %H:%M}-{end_time:%H:%M} "
+            f"(show #{show.id}: {show.artist_name} at {show.venue_name}).")
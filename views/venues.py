@@ -0,0 +1,285 @@
+import sys
+from datetime import datetime
+from itertools import groupby
+from flask import Blueprint, current_app, flash, g, redirect, render_template, request, url_for
+from forms import VenueForm
+from models import (db, Venue, Artist, Show, VenueDirectory, genre_counts, has_genre,
+                    refresh_show_counters, replica_read)
+from search import search
+from autocomplete import autocomplete
+from views import (conditional_page, format_show_times, not_found_error, page_cache,
+                   venue_page_key)
+
+bp = Blueprint('venues', __name__)
+
+
+@bp.route('/venues')
+@replica_read
+def venues():
+    # ?genre= narrows the directory to one genre; the facet counts next to it
+    # are over all venues, so the other genres stay one click away.
+    genre = request.args.get('genre') or None
+    data = []
+    genres = []
+    try:
+        # One scan of the venue directory, in the order of its area index;
+        # it trails writes by VENUE_DIRECTORY_REFRESH_DELAY (see directory.py).
+        query = db.session.query(
+            VenueDirectory.city, VenueDirectory.state, VenueDirectory.id,
+            VenueDirectory.name, VenueDirectory.num_upcoming_shows,
+        )
+        if genre:
+            query = query.filter(has_genre(VenueDirectory, genre))
+        rows = query.order_by(
+            VenueDirectory.state, VenueDirectory.city, VenueDirectory.name
+        ).all()
+        genres = genre_counts(Venue)
+
+        for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+            data.append({
+                "city": city,
+                "state": state,
+                "venues": [{
+                    "id": venue.id,
+                    "name": venue.name,
+                    "num_upcoming_shows": venue.num_upcoming_shows,
+                } for venue in venues],
+            })
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Something went wrong. Please try again.")
+        return render_template("pages/home.html")
+
+    finally:
+        db.session.close()
+        return render_template("pages/venues.html", areas=data, genres=genres, genre=genre)
+
+
+@bp.route('/venues/search', methods=['POST'])
+@replica_read
+def search_venues():
+    # Implements ranked search on venues by name, city or state. Case-insensitive.
+
+    search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    response = search(Venue, search_term, page, current_app.config['SEARCH_PAGE_SIZE'])
+
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@bp.route('/venues/<int:venue_id>')
+@replica_read
+@conditional_page(Venue)
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+
+    data = page_cache().get(venue_page_key(venue_id, g.page_version))
+    if data is not None:
+        return render_template('pages/show_venue.html', venue=data)
+
+    data = {}
+    try:
+        current_time = datetime.now()
+        venue = Venue.query.get(venue_id)
+
+        if venue is None:
+            return not_found_error(404)
+
+        # Shows come back with their artist joined, upcoming first, so the
+        # split below is a single pass over already ordered rows.
+        is_upcoming = (Show.start_time > current_time).label("is_upcoming")
+        shows = db.session.query(
+            Show.artist_id, Show.start_time, Artist.name, Artist.image_link,
+            Artist.upcoming_show_count, is_upcoming
+        ).join(
+            Artist, Show.artist_id == Artist.id
+        ).filter(
+            Show.venue_id == venue_id
+        ).order_by(
+            is_upcoming.desc(), Show.start_time
+        ).all()
+
+        upcoming_shows = []
+        past_shows = []
+
+        for show in shows:
+            show_data = {
+                "artist_id": show.artist_id,
+                "artist_name": show.name,
+                "artist_image_link": show.image_link,
+                "num_upcoming_shows": show.upcoming_show_count,
+                "start_time": show.start_time
+            }
+            if show.is_upcoming:
+                upcoming_shows.append(show_data)
+            else:
+                past_shows.append(show_data)
+
+ 
+        format_show_times(upcoming_shows + past_shows)
+        data = {"id": venue_id,
+                "name": str(venue.name),
+                "genres": venue.genres,
+                "address": venue.address,
+                "city": venue.city,
+                "state": venue.state,
+                "phone": venue.phone,
+                "website": venue.website,
+                "facebook_link": venue.facebook_link,
+                "seeking_talent": venue.seeking_talent,
+                "seeking_description": venue.seeking_description,
+                "image_link": venue.image_link,
+                "past_shows": past_shows,
+                "upcoming_shows": upcoming_shows,
+                "past_shows_count": len(past_shows),
+                "upcoming_shows_count": len(upcoming_shows),
+                }
+        page_cache().set(venue_page_key(venue_id, g.page_version), data)
+
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Something went wrong. Please try again.")
+        return render_template("pages/home.html")
+
+    finally:
+        db.session.close()
+        return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    try:
+      new_venue = Venue(
+        name = request.form.get('name'),
+        genres = request.form.getlist('genres'),
+        city = request.form.get('city'),
+        state = request.form.get('state'),
+        address = request.form.get('address'),
+        phone = request.form.get('phone'),
+        image_link = request.form.get('image_link'),
+        facebook_link = request.form.get('facebook_link'),
+        website = request.form.get('website_link'),
+        seeking_talent = (request.form.get("seeking_talent", False) == 'y'),
+        seeking_description = request.form.get('seeking_description'),
+      )
+
+      db.session.add(new_venue)
+      db.session.flush()
+      venue_id = new_venue.id
+      db.session.commit()
+      autocomplete().add('venues', venue_id, request.form.get('name'))
+
+  #    db.session.refresh(new_venue)
+      flash("Venue " + request.form.get("name") + " was successfully listed!")
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash(
+            "An error occurred. Venue "
+            + request.form.get("name")
+            + " could not be listed."
+        )
+    finally:
+        db.session.close()
+        return render_template('pages/home.html')
+
+
+@bp.route('/venues/<venue_id>', methods=['POST'])
+def delete_venue(venue_id):
+    try:
+        venue = Venue.query.filter_by(id=venue_id).first_or_404()
+        # artists booked here lose these shows through the cascade
+        artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter(
+            Show.venue_id == venue.id).distinct()]
+        db.session.delete(venue)
+        db.session.flush()
+        if artist_ids:
+            refresh_show_counters(Artist, artist_ids)
+        db.session.commit()
+        autocomplete().remove('venues', venue.id)
+        flash('The venue has been removed together with all of its shows.')
+        return render_template('pages/home.html')
+    except ValueError:
+        flash('It was not possible to delete this Venue')
+    return redirect(url_for('venues.venues'))
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm(request.form)
+    try:
+        venue = Venue.query.get(venue_id)
+        if venue is None:
+             return not_found_error(404)
+
+        form.name.data = venue.name
+        form.genres.data = venue.genres
+        form.address.data = venue.address
+        form.city.data = venue.city
+        form.state.data = venue.state
+        form.phone.data = venue.phone
+        form.website_link.data = venue.website
+        form.facebook_link.data = venue.facebook_link
+        form.seeking_talent.data = venue.seeking_talent
+        form.seeking_description.data = venue.seeking_description
+        form.image_link.data =  venue.image_link
+
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash("Something went wrong. Please try again.")
+        return redirect(url_for("main.index"))
+
+    finally:
+        db.session.close()
+        return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    form = VenueForm(request.form)
+    try:
+        venue = Venue.query.get(venue_id)
+
+        venue.name = request.form.get("name")
+        venue.genres = request.form.getlist("genres")
+        venue.city = request.form.get("city")
+        venue.state = request.form.get("state")
+        venue.address = request.form.get("address")
+        venue.phone = request.form.get("phone")
+        venue.facebook_link = request.form.get("facebook_link")
+        venue.seeking_talent = (request.form.get("seeking_talent", False) == 'y')
+        venue.seeking_description = request.form.get("seeking_description")
+        venue.image_link =  request.form.get("image_link")
+
+        db.session.add(venue)
+        db.session.commit()
+        autocomplete().update('venues', venue_id, request.form.get('name'))
+
+        flash("This venue was successfully updated!")
+    except:
+        db.session.rollback()
+        print(sys.exc_info())
+        flash(
+            "An error occurred. Venue "
+            + request.form.get("name")
+            + " could not be updated."
+        )
+
+    finally:
+        db.session.close()
+        return redirect(url_for("venues.show_venue", venue_id=venue_id))